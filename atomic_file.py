@@ -0,0 +1,22 @@
+import json
+import os
+
+def write_bytes(path, body):
+    """
+    Replaces path with body via a temp file and a rename: a reader, or the next run after
+    a crash mid-write, sees either the old or the new file, never a truncated one.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(body)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def write_json(path, data, **kwargs):
+    """json.dump to path (ensure_ascii off), atomically. kwargs go to json.dumps."""
+    kwargs.setdefault('ensure_ascii', False)
+    write_bytes(path, json.dumps(data, **kwargs).encode('utf-8'))
@@ -0,0 +1,64 @@
+"""
+Micro-benchmark: compiled KeywordMatcher vs plain loops over the keywords.
+- search(): vs any(kw in text ...) (the old filter).
+- matches(): vs {kw for kw in keywords if kw in text} (what the fetcher calls per title).
+
+Usage (from the repo root):
+    python benchmarks/bench_keyword_matcher.py
+"""
+import json
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from keyword_matcher import KeywordMatcher
+
+DB_FILE = "data/news_db.json"
+KEYWORD_COUNTS = [9, 100, 500, 2000]
+REPEAT = 5
+
+def load_titles():
+    with open(DB_FILE, 'r', encoding='utf-8') as f:
+        items = json.load(f)
+    return [i['title'] for i in items] + [i['description'] for i in items]
+
+def make_keywords(texts, n):
+    # Real app keywords first, padded with random 2-4 char words over the corpus alphabet
+    # (like real keywords, most of them don't occur in most titles)
+    with open('app_config.json', 'r', encoding='utf-8') as f:
+        keywords = list(json.load(f).get('filter_keywords', []))
+    alphabet = sorted(set(''.join(texts)))
+    rng = random.Random(42)
+    while len(keywords) < n:
+        keywords.append(''.join(rng.choice(alphabet) for _ in range(rng.randint(2, 4))))
+    return keywords[:n]
+
+def main():
+    texts = load_titles()
+    print(f"{len(texts)} texts (titles + descriptions)")
+    print(f"{'keywords':>8} {'mode':>9} {'method':>8} {'loop ms':>10} {'matcher ms':>11} {'speedup':>8}")
+
+    for n in KEYWORD_COUNTS:
+        keywords = make_keywords(texts, n)
+        matcher = KeywordMatcher(keywords)
+
+        mode = "dispatch" if matcher.dispatch else "regex"
+
+        def search_loop(t):
+            return any(kw in t for kw in keywords)
+
+        def matches_loop(t):
+            return {kw for kw in keywords if kw in t}
+
+        for method, plain, compiled in (("search", search_loop, matcher.search),
+                                        ("matches", matches_loop, matcher.matches)):
+            assert [plain(t) for t in texts] == [compiled(t) for t in texts]
+            loop = min(timeit.repeat(lambda: [plain(t) for t in texts], number=1, repeat=REPEAT))
+            fast = min(timeit.repeat(lambda: [compiled(t) for t in texts], number=1, repeat=REPEAT))
+            print(f"{n:>8} {mode:>9} {method:>8} {loop * 1000:>10.2f} {fast * 1000:>11.2f} {loop / fast:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
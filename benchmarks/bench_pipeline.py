@@ -0,0 +1,241 @@
+"""
+Benchmark: fetch_news.main end to end against a local feed server and a Feishu stand-in.
+
+Usage (from the repo root):
+    python benchmarks/bench_pipeline.py [--scales 100,1000,10000] [--latency 50] [--jitter 50]
+                                        [--items 30] [--desc-size 600] [--failure-rate 0.02]
+                                        [--hosts 32] [--fixtures DIR]
+
+Nothing leaves the machine:
+- Feeds are served from --hosts listeners on 127.0.0.1 (each port counts as its own host
+  for the per-host concurrency limit). Synthetic RSS by default (titles always contain one of
+  the configured filter_keywords), or the recorded responses in --fixtures (*.xml, served
+  round-robin; stale pubDates exercise the time-window cut-off instead).
+- Every response waits latency +/- jitter ms. A deterministic --failure-rate share of feeds
+  answers 500, so retries and the error-log upload are part of the run.
+- FEISHU_BASE_URL points the token and batch_create calls at the same server, which
+  accepts everything and counts the records.
+
+Each scale runs in its own subprocess and temporary working directory (fresh caches,
+fresh store, the repo's app_config.json with adaptive polling off), so peak RSS is per run.
+Per-feed latencies come from the run's data/metrics/*.jsonl, the pipeline's log goes to
+run.log in the working directory (kept with --keep).
+"""
+import argparse
+import glob
+import http.server
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+
+from datetime import datetime, timezone, timedelta
+from email.utils import format_datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CJK = [chr(c) for c in range(0x4e00, 0x9fa6)]
+
+def random_text(rng, chars):
+    # Random CJK text, so unrelated items never look like near-duplicates
+    return "".join(rng.choices(CJK, k=chars))
+
+def synthetic_feed(feed_id, items, desc_size, keywords):
+    rng = random.Random(feed_id)
+    now = datetime.now(timezone.utc)
+    parts = []
+    for i in range(items):
+        title = random_text(rng, 8) + rng.choice(keywords) + random_text(rng, 6)
+        body = random_text(rng, desc_size // 3)
+        parts.append(
+            f"<item><title>{title}</title><link>http://feeds.local/{feed_id}/{i}</link>"
+            f"<pubDate>{format_datetime(now - timedelta(minutes=20 * i))}</pubDate>"
+            f"<description>&lt;p&gt;{body}&lt;/p&gt;</description></item>"
+        )
+    return (f'<?xml version="1.0" encoding="utf-8"?><rss version="2.0"><channel>'
+            f'<title>feed {feed_id}</title>{"".join(parts)}</channel></rss>').encode('utf-8')
+
+class StandInServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass # Clients dropping idle keep-alive connections at exit
+
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    options = None
+    fixtures = []
+    feishu_records = 0
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=b"", content_type="application/rss+xml"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        opts = self.options
+        time.sleep(max(0.0, opts.latency + random.uniform(-opts.jitter, opts.jitter)) / 1000)
+
+        if zlib.crc32(self.path.encode()) % 10000 < opts.failure_rate * 10000:
+            self._send(500)
+            return
+        feed_id = self.path.strip('/').split('/')[-1].split('.')[0]
+        if self.fixtures:
+            body = self.fixtures[zlib.crc32(feed_id.encode()) % len(self.fixtures)]
+        else:
+            body = synthetic_feed(feed_id, opts.items, opts.desc_size, opts.keywords)
+        self._send(200, body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        data = json.loads(self.rfile.read(length) or b"{}")
+        if self.path.endswith("/tenant_access_token/internal"):
+            out = {"code": 0, "tenant_access_token": "t-bench", "expire": 7200}
+        else:
+            records = data.get("records", [])
+            with self.lock:
+                StandInHandler.feishu_records += len(records)
+            out = {"code": 0, "data": {"records": [{"record_id": f"rec{i}"} for i in range(len(records))]}}
+        self._send(200, json.dumps(out).encode(), "application/json")
+
+def start_server(options):
+    StandInHandler.options = options
+    if options.fixtures:
+        for path in sorted(glob.glob(os.path.join(options.fixtures, "*.xml"))):
+            with open(path, 'rb') as f:
+                StandInHandler.fixtures.append(f.read())
+    # One listener per simulated host: fetch_news limits concurrency per host (netloc)
+    servers = []
+    for _ in range(options.hosts):
+        server = StandInServer(("127.0.0.1", 0), StandInHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+    return servers
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+def child(ports, sources):
+    """Runs inside the scale's working directory."""
+    import resource
+
+    with open(os.path.join(ROOT, "app_config.json"), 'r', encoding='utf-8') as f:
+        app_config = json.load(f)
+    app_config["adaptive_polling"] = False # Every source is polled
+    with open("app_config.json", 'w', encoding='utf-8') as f:
+        json.dump(app_config, f, ensure_ascii=False)
+    with open("rss_config.json", 'w', encoding='utf-8') as f:
+        json.dump({f"bench-{i}": f"http://127.0.0.1:{ports[i % len(ports)]}/feed/{i}.xml" for i in range(sources)}, f)
+
+    import fetch_news
+
+    started = time.perf_counter()
+    with open("run.log", 'w', encoding='utf-8') as log:
+        stdout = sys.stdout
+        sys.stdout = log
+        try:
+            fetch_news.main()
+        finally:
+            sys.stdout = stdout
+    elapsed = time.perf_counter() - started
+
+    latencies = []
+    run = {}
+    for path in glob.glob("data/metrics/*.jsonl"):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                row = json.loads(line)
+                if row["type"] == "source":
+                    latencies.append(row.get("latency", 0))
+                elif row["type"] == "run":
+                    run = row
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_mb = peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    print(json.dumps({
+        "seconds": elapsed,
+        "items": run.get("counters", {}).get("records_fetched", 0),
+        "errors": run.get("errors", 0),
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "peak_mb": peak_mb
+    }))
+
+def run_scale(options, servers, sources):
+    workdir = tempfile.mkdtemp(prefix=f"newsbot-bench-{sources}-")
+    ports = [server.server_address[1] for server in servers]
+    env = dict(os.environ)
+    env.update({
+        "FEISHU_BASE_URL": f"http://127.0.0.1:{ports[0]}",
+        "FEISHU_APP_ID": "bench", "FEISHU_APP_SECRET": "bench",
+        "FEISHU_APP_TOKEN": "bench", "FEISHU_TABLE_ID": "bench",
+        "FEISHU_ERROR_TABLE_ID": "bench-errors", "FEISHU_ERROR_APP_TOKEN": "bench"
+    })
+
+    before = StandInHandler.feishu_records
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", ",".join(map(str, ports)), str(sources)],
+        cwd=workdir, env=env, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        print(f"{sources:>8}  failed, see {workdir}/run.log\n{proc.stderr[-2000:]}")
+        return
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    uploaded = StandInHandler.feishu_records - before
+
+    print(f"{sources:>8} {result['seconds']:>9.1f} {sources / result['seconds']:>9.1f} "
+          f"{result['items'] / result['seconds']:>9.0f} {result['p50'] * 1000:>8.0f} {result['p95'] * 1000:>8.0f} "
+          f"{result['errors']:>7} {uploaded:>9} {result['peak_mb']:>8.0f}")
+    if options.keep:
+        print(f"{'':>8} kept {workdir}")
+    else:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def main():
+    if len(sys.argv) == 4 and sys.argv[1] == "--child":
+        child([int(p) for p in sys.argv[2].split(",")], int(sys.argv[3]))
+        return
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scales", default="100,1000,10000", help="comma separated source counts")
+    parser.add_argument("--latency", type=float, default=50, help="mean response latency in ms")
+    parser.add_argument("--jitter", type=float, default=50, help="uniform latency jitter in ms")
+    parser.add_argument("--items", type=int, default=30, help="items per synthetic feed")
+    parser.add_argument("--desc-size", type=int, default=600, help="description bytes per synthetic item")
+    parser.add_argument("--failure-rate", type=float, default=0.02, help="share of feeds answering 500")
+    parser.add_argument("--hosts", type=int, default=32, help="simulated feed hosts (one listener each)")
+    parser.add_argument("--fixtures", help="directory of recorded *.xml feed responses")
+    parser.add_argument("--keep", action="store_true", help="keep the working directories")
+    options = parser.parse_args()
+
+    with open(os.path.join(ROOT, "app_config.json"), 'r', encoding='utf-8') as f:
+        options.keywords = json.load(f).get("filter_keywords") or ["经济"]
+
+    servers = start_server(options)
+    print(f"{'sources':>8} {'total s':>9} {'feeds/s':>9} {'items/s':>9} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'errors':>7} {'uploaded':>9} {'peak MB':>8}")
+    try:
+        for sources in (int(s) for s in options.scales.split(",")):
+            run_scale(options, servers, sources)
+    finally:
+        for server in servers:
+            server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -1,65 +1,554 @@
+import hashlib
 import json
 import os
+import sqlite3
 import time
 
-DB_FILE = "data/news_db.json"
-MAX_DB_SIZE = 1000 # Keep last 1000 items to avoid file bloating
+import atomic_file
+import dedup
+import search_index
 
-def load_data():
-    """Loads the existing news database."""
+from news_item import NewsItem
+
+DB_FILE = "data/news_db.json" # Exported view read by index.html
+STORE_FILE = "data/news.db" # SQLite store, rebuilt from LOG_FILE when missing (not committed)
+LOG_FILE = "data/news_log.jsonl" # Append-only history: one line per stored item or source merge
+MAX_DB_SIZE = 1000 # Newest items exported to DB_FILE (the store itself is not trimmed)
+SHARD_DIR = "data/shards" # Per-day minified exports, file names carry a content hash
+MANIFEST_FILE = "data/manifest.json" # Shard list (newest first) loaded by index.html
+MANIFEST_VERSION = 2 # Bumped when shard contents/order change: every shard is rebuilt once
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS news (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    link TEXT NOT NULL UNIQUE,
+    title TEXT,
+    source TEXT,
+    date TEXT,
+    description TEXT,
+    added_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_news_date ON news (date DESC, id);
+"""
+
+# Near-duplicate detection: SimHash plus one LSH band per column, each indexed
+DEDUP_COLUMNS = (
+    ("simhash", "INTEGER"),
+    ("band0", "INTEGER"),
+    ("band1", "INTEGER"),
+    ("band2", "INTEGER"),
+    ("band3", "INTEGER"),
+    ("sources", "TEXT") # JSON list when a story was carried by several sources
+)
+
+# Full-text search: contentless FTS5 index over pre-tokenized title/description (see
+# search_index.tokenize), rowid = news.id. Items with id above indexed_upto are not indexed yet.
+SEARCH_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS news_search USING fts5(title, body, content='');
+CREATE TABLE IF NOT EXISTS search_state (id INTEGER PRIMARY KEY CHECK (id = 0), indexed_upto INTEGER NOT NULL);
+INSERT OR IGNORE INTO search_state (id, indexed_upto) VALUES (0, 0);
+"""
+
+# Newest day first, then by real publish time within the day (day shards use the same order)
+ITEM_ORDER = "date DESC, published DESC, id"
+SHARD_ORDER = "published DESC, id"
+
+COLUMNS = ("title", "link", "source", "date", "published", "description", "sources")
+SELECT_ITEM = "SELECT title, link, source, date, published, description, sources FROM news"
+INSERT_ITEM = (
+    "INSERT OR IGNORE INTO news (title, link, source, date, published, description, added_at, "
+    "simhash, band0, band1, band2, band3, sources) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+def _to_signed(fp):
+    # SQLite integers are signed 64-bit
+    return fp - (1 << 64) if fp >= (1 << 63) else fp
+
+def _to_unsigned(value):
+    return value + (1 << 64) if value < 0 else value
+
+def _item_row(item, now):
+    # item: NewsItem
+    fp = item.simhash
+    if fp is None:
+        fp = dedup.fingerprint(item.title or '', item.description or '')
+    sources = item.sources
+    return (
+        item.title, item.link, item.source, item.date, item.published, item.description, now,
+        _to_signed(fp), *dedup.bands(fp),
+        json.dumps(sources, ensure_ascii=False) if sources and len(sources) > 1 else None
+    )
+
+def _ensure_dedup_columns(conn):
+    # Stores created before near-duplicate detection: add the columns and backfill fingerprints
+    existing = {r[1] for r in conn.execute("PRAGMA table_info(news)")}
+    missing = [(name, decl) for name, decl in DEDUP_COLUMNS if name not in existing]
+    if not missing:
+        return
+    with conn:
+        for name, decl in missing:
+            conn.execute(f"ALTER TABLE news ADD COLUMN {name} {decl}")
+        rows = conn.execute("SELECT id, title, description FROM news WHERE simhash IS NULL").fetchall()
+        updates = []
+        for r in rows:
+            fp = dedup.fingerprint(r['title'] or '', r['description'] or '')
+            updates.append((_to_signed(fp), *dedup.bands(fp), r['id']))
+        conn.executemany(
+            "UPDATE news SET simhash = ?, band0 = ?, band1 = ?, band2 = ?, band3 = ? WHERE id = ?",
+            updates
+        )
+    if updates:
+        print(f"Added near-duplicate fingerprints to {len(updates)} stored items.")
+
+def _ensure_published_column(conn):
+    # Stores created before items carried a publish timestamp: start of their day (UTC)
+    existing = {r[1] for r in conn.execute("PRAGMA table_info(news)")}
+    if "published" not in existing:
+        with conn:
+            conn.execute("ALTER TABLE news ADD COLUMN published REAL")
+            conn.execute("UPDATE news SET published = CAST(strftime('%s', date) AS REAL) WHERE published IS NULL")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_news_published ON news (date DESC, published DESC, id)")
+
+def _ensure_search_index(conn):
+    # FTS5 is compiled into the sqlite3 module of python.org, Actions and most distro builds
+    try:
+        conn.executescript(SEARCH_SCHEMA)
+    except sqlite3.OperationalError as e:
+        print(f"Warning: Full-text search unavailable ({e}).")
+        return False
+    return True
+
+def _index_new(conn):
+    """Adds items not in the search index yet (new inserts, or the whole store on first use)."""
+    upto = conn.execute("SELECT indexed_upto FROM search_state WHERE id = 0").fetchone()[0]
+    rows = conn.execute("SELECT id, title, description FROM news WHERE id > ? ORDER BY id", (upto,)).fetchall()
+    if not rows:
+        return 0
+    conn.executemany(
+        "INSERT INTO news_search (rowid, title, body) VALUES (?, ?, ?)",
+        [(r['id'], *search_index.document(r['title'], r['description'])) for r in rows]
+    )
+    conn.execute("UPDATE search_state SET indexed_upto = ? WHERE id = 0", (rows[-1]['id'],))
+    return len(rows)
+
+def _migrate_json(conn):
+    # First run on the SQLite store: import the old JSON database in its existing order
     if not os.path.exists(DB_FILE):
-        return []
-    
+        return
     try:
         with open(DB_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
+            items = json.load(f)
     except (json.JSONDecodeError, FileNotFoundError):
+        return
+
+    now = time.time()
+    conn.executemany(INSERT_ITEM, [_item_row(NewsItem.from_dict(i), now) for i in items if i.get('link')])
+    print(f"Migrated {len(items)} items from {DB_FILE} into {STORE_FILE}.")
+
+def _log_record(item, now):
+    # A stored item as a LOG_FILE line; simhash is kept so a rebuild need not fingerprint again
+    fp = item.simhash
+    if fp is None:
+        fp = dedup.fingerprint(item.title or '', item.description or '')
+    record = {"title": item.title, "link": item.link, "source": item.source, "date": item.date,
+              "published": item.published, "description": item.description, "added_at": now, "simhash": fp}
+    if item.sources and len(item.sources) > 1:
+        record["sources"] = item.sources
+    return record
+
+def _append_log(records):
+    """Appends records to LOG_FILE (fsynced), before the store is changed."""
+    os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
+    with open(LOG_FILE, 'a+b') as f:
+        # A run killed mid-append leaves a torn last line: start on a fresh one
+        if f.tell() > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+        f.write("".join(json.dumps(r, ensure_ascii=False, separators=(',', ':')) + "\n" for r in records).encode('utf-8'))
+        f.flush()
+        os.fsync(f.fileno())
+
+def _replay_log(conn):
+    # Rebuilds the store from LOG_FILE; replaying a line twice changes nothing
+    rows = []
+    count = 0
+    with open(LOG_FILE, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue # Torn line of a killed run
+            if 'merge' in record:
+                conn.executemany(INSERT_ITEM, rows)
+                rows = []
+                conn.execute("UPDATE news SET sources = ? WHERE link = ?",
+                             (json.dumps(record['sources'], ensure_ascii=False), record['merge']))
+                continue
+            item = NewsItem.from_dict(record)
+            item.simhash = record.get('simhash')
+            rows.append(_item_row(item, record.get('added_at') or time.time()))
+            count += 1
+    conn.executemany(INSERT_ITEM, rows)
+    print(f"Rebuilt {STORE_FILE} from {count} items in {LOG_FILE}.")
+
+def _seed_log(conn):
+    # Stores from before LOG_FILE (or just migrated from DB_FILE): the log starts with their items
+    rows = conn.execute("SELECT title, link, source, date, published, description, sources, simhash, added_at "
+                        "FROM news ORDER BY id").fetchall()
+    if not rows:
+        return
+    records = []
+    for r in rows:
+        record = {**_row_to_item(r), "published": r['published'], "added_at": r['added_at']}
+        if r['simhash'] is not None:
+            record["simhash"] = _to_unsigned(r['simhash'])
+        records.append(record)
+    _append_log(records)
+    print(f"Wrote {len(records)} stored items to {LOG_FILE}.")
+
+def get_connection():
+    """
+    Opens the SQLite store, creating it if needed: rebuilt from LOG_FILE, or on first use
+    migrated from DB_FILE (LOG_FILE is then started from the store).
+    """
+    os.makedirs(os.path.dirname(STORE_FILE), exist_ok=True)
+    is_new = not os.path.exists(STORE_FILE)
+
+    conn = sqlite3.connect(STORE_FILE)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    _ensure_dedup_columns(conn)
+    _ensure_published_column(conn)
+    conn.executescript(
+        "".join(f"CREATE INDEX IF NOT EXISTS idx_news_band{i} ON news (band{i});" for i in range(dedup.BAND_COUNT))
+    )
+    if is_new:
+        with conn:
+            if os.path.exists(LOG_FILE):
+                _replay_log(conn)
+            else:
+                _migrate_json(conn)
+    if not os.path.exists(LOG_FILE):
+        _seed_log(conn)
+    if _ensure_search_index(conn):
+        with conn:
+            indexed = _index_new(conn)
+        if indexed and not is_new:
+            print(f"Added {indexed} stored items to the search index.")
+    return conn
+
+def _row_to_item(row):
+    # Export form (what index.html renders), read back by NewsItem.from_dict
+    item = {key: row[key] for key in COLUMNS if key not in ("published", "sources")}
+    if row["published"] is not None:
+        item["published"] = int(row["published"])
+    if row["sources"]:
+        item["sources"] = json.loads(row["sources"])
+    return item
+
+def load_data(limit=None):
+    """Loads stored news items (dicts), newest date first, newest publish time first within a day."""
+    if not os.path.exists(STORE_FILE) and not os.path.exists(LOG_FILE) and not os.path.exists(DB_FILE):
         return []
 
+    conn = get_connection()
+    try:
+        sql = SELECT_ITEM + " ORDER BY " + ITEM_ORDER
+        if limit is not None:
+            rows = conn.execute(sql + " LIMIT ?", (limit,)).fetchall()
+        else:
+            rows = conn.execute(sql).fetchall()
+        return [_row_to_item(r) for r in rows]
+    finally:
+        conn.close()
+
+def export_json(conn):
+    """Rewrites DB_FILE with the newest MAX_DB_SIZE items for the web page."""
+    rows = conn.execute(
+        SELECT_ITEM + " ORDER BY " + ITEM_ORDER + " LIMIT ?",
+        (MAX_DB_SIZE,)
+    ).fetchall()
+    items = [_row_to_item(r) for r in rows]
+    atomic_file.write_json(DB_FILE, items, indent=2)
+    return len(items)
+
+def _load_manifest():
+    try:
+        with open(MANIFEST_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (json.JSONDecodeError, FileNotFoundError):
+        return None
+
+def _export_search(conn):
+    # Title index for client-side search, ordinals in manifest order (see search_index.client_index)
+    rows = conn.execute("SELECT title FROM news WHERE date IS NOT NULL ORDER BY " + ITEM_ORDER)
+    index = search_index.client_index(r['title'] for r in rows)
+    body = json.dumps(index, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    digest = hashlib.sha1(body).hexdigest()[:10]
+    filename = f"search.{digest}.json"
+    path = os.path.join(SHARD_DIR, filename)
+    if not os.path.exists(path):
+        atomic_file.write_bytes(path, body)
+    return {"file": filename, "hash": digest, "docs": index['docs']}
+
+def _stale_dates(conn, manifest):
+    # Days whose stored item count differs from the manifest, e.g. items inserted by
+    # a run that was killed before it exported them
+    counts = {s['date']: s['count'] for s in manifest['shards']}
+    stale = set()
+    for date, count in conn.execute("SELECT date, COUNT(*) FROM news WHERE date IS NOT NULL GROUP BY date"):
+        if counts.pop(date, None) != count:
+            stale.add(date)
+    return stale | set(counts)
+
+def export_shards(conn, dates=None, search=True):
+    """
+    Writes one minified shard per day plus MANIFEST_FILE.
+    - dates: days to (re)export; None rebuilds every day in the store. Days whose item
+      count no longer matches the manifest are re-exported as well.
+    - Shard names are <date>.<content hash>.json, so a shard never changes once written
+      and the browser can cache it indefinitely. Only the manifest must be revalidated.
+    - search: rebuild the client-side title index (titles or days changed); otherwise
+      the manifest keeps pointing at the current one.
+    """
+    os.makedirs(SHARD_DIR, exist_ok=True)
+
+    manifest = _load_manifest()
+    if manifest is None or manifest.get('version') != MANIFEST_VERSION:
+        manifest = None
+        dates = None
+    shards = {} if dates is None else {s['date']: s for s in manifest['shards']}
+
+    if dates is None:
+        dates = [r[0] for r in conn.execute("SELECT DISTINCT date FROM news")]
+    else:
+        dates = set(dates) | _stale_dates(conn, manifest)
+
+    for date in dates:
+        rows = conn.execute(
+            SELECT_ITEM + " WHERE date = ? ORDER BY " + SHARD_ORDER,
+            (date,)
+        ).fetchall()
+        if not rows:
+            shards.pop(date, None)
+            continue
+
+        body = json.dumps([_row_to_item(r) for r in rows], ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        digest = hashlib.sha1(body).hexdigest()[:10]
+        filename = f"{date}.{digest}.json"
+        path = os.path.join(SHARD_DIR, filename)
+        if not os.path.exists(path):
+            atomic_file.write_bytes(path, body)
+        shards[date] = {"date": date, "file": filename, "hash": digest, "count": len(rows)}
+
+    ordered = sorted(shards.values(), key=lambda s: s['date'] or '', reverse=True)
+    search_entry = manifest.get('search') if manifest and not search else None
+    if search_entry is None:
+        search_entry = _export_search(conn)
+    atomic_file.write_json(MANIFEST_FILE, {
+        "version": MANIFEST_VERSION,
+        "generated": int(time.time()),
+        "total": sum(s['count'] for s in ordered),
+        "shards": ordered,
+        "search": search_entry
+    }, separators=(',', ':'))
+
+    # Drop shard files the manifest no longer points to
+    live = {s['file'] for s in ordered} | {search_entry['file']}
+    for name in os.listdir(SHARD_DIR):
+        if name.endswith('.json') and name not in live:
+            os.remove(os.path.join(SHARD_DIR, name))
+    return len(ordered)
+
+def _unstored(conn, items):
+    # Items whose link is not in the store yet (first copy of each)
+    links = list({i.link for i in items})
+    stored = set()
+    for start in range(0, len(links), 500):
+        chunk = links[start:start + 500]
+        stored.update(r[0] for r in conn.execute(
+            f"SELECT link FROM news WHERE link IN ({','.join('?' * len(chunk))})", chunk))
+    new_items = []
+    for item in items:
+        if item.link not in stored:
+            stored.add(item.link)
+            new_items.append(item)
+    return new_items
+
+def _insert(conn, new_items):
+    now = time.time()
+    new_items = _unstored(conn, new_items)
+    if not new_items:
+        return 0
+    # Logged first: a run killed in between leaves an item the rebuild adds, never a lost one
+    _append_log([_log_record(i, now) for i in new_items])
+    with conn:
+        before = conn.total_changes
+        conn.executemany(INSERT_ITEM, [_item_row(i, now) for i in new_items])
+        added_count = conn.total_changes - before
+        if added_count:
+            _index_new(conn)
+    return added_count
+
+def _export(conn, added_count, dates):
+    total = conn.execute("SELECT COUNT(*) FROM news").fetchone()[0]
+    try:
+        exported = export_json(conn)
+        shard_count = export_shards(conn, dates)
+        print(f"Database updated. Added {added_count} items. Total: {total} (exported {exported}, {shard_count} day shards).")
+    except Exception as e:
+        print(f"Error saving database: {e}")
+
 def save_data(new_items):
     """
     Saves new items to the database.
-    - unique_key: 'link'
-    - Deduplicates against existing data.
-    - Sorts by 'date' (descending).
-    - Trims to MAX_DB_SIZE.
+    - unique_key: 'link' (enforced by the store, inserts cost O(new items)).
+    - Keeps the full history in STORE_FILE.
+    - new_items: NewsItems.
+    - Re-exports the newest MAX_DB_SIZE items (newest day first, then by publish time) to DB_FILE.
+    - Re-exports the per-day shards touched by new_items (see export_shards).
     """
     if not new_items:
         return
 
-    # Ensure directory exists
-    os.makedirs(os.path.dirname(DB_FILE), exist_ok=True)
-    
-    current_data = load_data()
-    
-    # Create a set of existing links for fast lookup
-    existing_links = {item['link'] for item in current_data}
-    
-    added_count = 0
-    for item in new_items:
-        if item['link'] not in existing_links:
-            current_data.append(item)
-            existing_links.add(item['link'])
-            added_count += 1
-            
-    if added_count == 0:
+    conn = get_connection()
+    try:
+        added_count = _insert(conn, new_items)
+        if added_count == 0:
+            print("No new items to add to database.")
+            return
+        _export(conn, added_count, {i.date for i in new_items})
+    finally:
+        conn.close()
+
+def insert_items(new_items):
+    """
+    Stores new items (committed right away) without re-exporting the web views, for
+    callers landing data in micro-batches. Returns the number of items actually added;
+    call export_views with the touched dates once the run is over.
+    """
+    if not new_items:
+        return 0
+    conn = get_connection()
+    try:
+        return _insert(conn, new_items)
+    finally:
+        conn.close()
+
+def export_views(dates, added_count):
+    """Re-exports DB_FILE and the shards of dates after insert_items calls."""
+    manifest = _load_manifest()
+    if not added_count and (manifest is None or not os.path.exists(STORE_FILE)):
         print("No new items to add to database.")
         return
+    conn = get_connection()
+    try:
+        # Even without new items: shards written by an older version, or missing what a
+        # killed run inserted but never exported, are rebuilt
+        if not added_count and manifest.get('version') == MANIFEST_VERSION and not _stale_dates(conn, manifest):
+            print("No new items to add to database.")
+            return
+        _export(conn, added_count, dates)
+    finally:
+        conn.close()
+
+def find_near_duplicates(fingerprints, max_distance=dedup.DEFAULT_MAX_DISTANCE,
+                         window_hours=dedup.DEFAULT_HISTORY_WINDOW_HOURS):
+    """
+    Looks up stored items within max_distance (Hamming) of each fingerprint.
+    Uses the indexed LSH band columns, so the cost depends on bucket sizes,
+    not on the size of the history. Returns {fp: closest stored item}.
+    - window_hours: only items published within this many hours are matched.
+    """
+    if not fingerprints or (not os.path.exists(STORE_FILE) and not os.path.exists(LOG_FILE) and not os.path.exists(DB_FILE)):
+        return {}
 
-    # Sort: Newest first
-    # We assume 'date' is YYYY-MM-DD. 
-    # For better sorting, we could use a timestamp, but string sort works for ISO format.
-    # To be safe, let's just sort by date string descending.
-    current_data.sort(key=lambda x: x.get('date', ''), reverse=True)
-    
-    # Trim
-    if len(current_data) > MAX_DB_SIZE:
-        current_data = current_data[:MAX_DB_SIZE]
-        
-    # Write back
+    cutoff = time.time() - float(window_hours) * 3600
+    conn = get_connection()
     try:
-        with open(DB_FILE, 'w', encoding='utf-8') as f:
-            json.dump(current_data, f, ensure_ascii=False, indent=2)
-        print(f"Database updated. Added {added_count} items. Total: {len(current_data)}")
-    except Exception as e:
-        print(f"Error saving database: {e}")
+        found = {}
+        for fp in fingerprints:
+            best = None
+            best_distance = max_distance + 1
+            rows = conn.execute(
+                "SELECT title, link, source, date, published, description, sources, simhash FROM news "
+                "WHERE (band0 = ? OR band1 = ? OR band2 = ? OR band3 = ?) AND published >= ?",
+                (*dedup.bands(fp), cutoff)
+            )
+            for r in rows:
+                distance = dedup.hamming(fp, _to_unsigned(r['simhash']))
+                if distance < best_distance:
+                    best, best_distance = r, distance
+            if best is not None:
+                found[fp] = _row_to_item(best)
+        return found
+    finally:
+        conn.close()
+
+def merge_sources(merges):
+    """
+    Records extra sources for stored stories (see dedup.Collapser.history_merges).
+    merges: {stored link: [new source names]}. Re-exports the affected days.
+    """
+    merges = {link: sources for link, sources in merges.items() if sources}
+    if not merges:
+        return
+
+    conn = get_connection()
+    try:
+        dates = set()
+        updates = {}
+        for link, new_sources in merges.items():
+            row = conn.execute("SELECT source, date, sources FROM news WHERE link = ?", (link,)).fetchone()
+            if row is None:
+                continue
+            sources = json.loads(row['sources']) if row['sources'] else [row['source']]
+            sources.extend(s for s in new_sources if s not in sources)
+            updates[link] = sources
+            dates.add(row['date'])
+        if not updates:
+            return
+        _append_log([{"merge": link, "sources": sources} for link, sources in updates.items()])
+        with conn:
+            conn.executemany(
+                "UPDATE news SET sources = ? WHERE link = ?",
+                [(json.dumps(sources, ensure_ascii=False), link) for link, sources in updates.items()]
+            )
+        export_json(conn)
+        export_shards(conn, dates, search=False)
+        print(f"Merged syndicated copies into {len(merges)} stored stories.")
+    finally:
+        conn.close()
+
+def search(query, limit=20):
+    """
+    Ranked full-text search over the stored history (title and start of the description).
+    Every query token must match; bm25 ranking with titles weighted TITLE_WEIGHT.
+    Returns item dicts with a 'score' (higher is better).
+    """
+    expression = search_index.match_expression(query)
+    if expression is None or (not os.path.exists(STORE_FILE) and not os.path.exists(LOG_FILE) and not os.path.exists(DB_FILE)):
+        return []
+
+    conn = get_connection()
+    try:
+        rows = conn.execute(
+            "SELECT n.title, n.link, n.source, n.date, n.published, n.description, n.sources, "
+            "bm25(news_search, ?, 1.0) AS rank FROM news_search "
+            "JOIN news n ON n.id = news_search.rowid "
+            "WHERE news_search MATCH ? ORDER BY rank LIMIT ?",
+            (search_index.TITLE_WEIGHT, expression, limit)
+        ).fetchall()
+    except sqlite3.OperationalError as e:
+        print(f"Search failed: {e}")
+        return []
+    finally:
+        conn.close()
+
+    results = []
+    for r in rows:
+        item = _row_to_item(r)
+        item['score'] = round(-r['rank'], 3) # bm25() is lower-is-better
+        results.append(item)
+    return results
@@ -1,6 +1,7 @@
-import requests
 import json
-import os
+
+import http_client
+from token_manager import FEISHU_BASE_URL, get_manager
 
 def load_config():
     try:
@@ -9,23 +10,17 @@ def load_config():
     except:
         return {}
 
-def get_tenant_access_token(app_id, app_secret):
-    url = "https://open.feishu.cn/open-apis/auth/v3/tenant_access_token/internal"
-    data = {"app_id": app_id, "app_secret": app_secret}
-    res = requests.post(url, json=data).json()
-    return res.get("tenant_access_token")
-
 def list_tables():
     config = load_config()
-    token = get_tenant_access_token(config['app_id'], config['app_secret'])
+    token = get_manager(config['app_id'], config['app_secret']).get()
     if not token: return
 
     # API to list tables
-    url = f"https://open.feishu.cn/open-apis/bitable/v1/apps/{config['app_token']}/tables"
+    url = f"{FEISHU_BASE_URL}/open-apis/bitable/v1/apps/{config['app_token']}/tables"
     headers = {"Authorization": f"Bearer {token}"}
     
     print(f"Fetching Tables for App Token: {config['app_token']}...")
-    resp = requests.get(url, headers=headers)
+    resp = http_client.get_session().get(url, headers=headers, timeout=10)
     print("Response Status:", resp.status_code)
     
     try:
@@ -0,0 +1,121 @@
+import hashlib
+import re
+
+from collections import Counter
+
+FINGERPRINT_BITS = 64
+BAND_COUNT = 4 # 4 x 16-bit bands: any two fingerprints within distance 3 share a band
+BAND_BITS = FINGERPRINT_BITS // BAND_COUNT
+DEFAULT_MAX_DISTANCE = 3 # Hamming distance treated as "same story"
+# Stored stories older than this are never matched: recurring templated news (daily open-market
+# notices ...) differs from last week's issue only in dates and amounts
+DEFAULT_HISTORY_WINDOW_HOURS = 48
+MAX_FEATURE_CHARS = 400 # Title plus the start of the description is enough to identify a story
+
+_NOISE = re.compile(r'[\W_]+', re.UNICODE)
+
+def _features(title, description):
+    # Character bigrams over letters/digits/CJK only, so punctuation, spacing and
+    # full/half-width differences between outlets don't matter
+    text = _NOISE.sub('', f"{title}{description or ''}"[:MAX_FEATURE_CHARS].lower())
+    if len(text) < 2:
+        return [text] if text else []
+    return [text[i:i + 2] for i in range(len(text) - 1)]
+
+def fingerprint(title, description=""):
+    """64-bit SimHash (unsigned int) over title + description bigrams."""
+    features = Counter(_features(title, description))
+    if not features:
+        return 0
+
+    rows = []
+    for feature, weight in features.items():
+        h = int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'big')
+        rows.extend([format(h, '064b')] * weight)
+
+    # Column-wise bit counts, done by str.count in C rather than per-bit Python loops
+    half = len(rows) / 2
+    bits = ''.join('1' if column.count('1') > half else '0' for column in zip(*rows))
+    return int(bits, 2)
+
+def bands(fp):
+    """Splits a fingerprint into BAND_COUNT LSH band keys."""
+    mask = (1 << BAND_BITS) - 1
+    return tuple((fp >> (i * BAND_BITS)) & mask for i in range(BAND_COUNT))
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+class Collapser:
+    """
+    Collapses syndicated copies of the same story across a run fed in micro-batches.
+    - history_lookup: optional callable (fingerprints, max_distance) -> {fp: stored item}, finds
+      near-duplicates already in the store (see data_manager.find_near_duplicates).
+    - add(items) takes NewsItems and returns the ones of a batch that are new stories. The first copy becomes
+      canonical; copies within the same batch are added to its 'sources' and their profile routes
+      to its 'profiles'. Copies of a story handed out in an earlier batch (already pushed/stored)
+      go to history_merges instead.
+    - history_merges maps a stored link to the new sources that carried it again.
+    Only fingerprints, links and source lists are kept between batches.
+    """
+
+    def __init__(self, history_lookup=None, max_distance=DEFAULT_MAX_DISTANCE):
+        self.history_lookup = history_lookup
+        self.max_distance = min(max_distance, BAND_COUNT - 1) # Banding only guarantees recall up to this
+        self.buckets = {}
+        self.history_merges = {}
+
+    def _merge_into_stored(self, link, known, source):
+        merged = self.history_merges.setdefault(link, [])
+        if source not in known and source not in merged:
+            merged.append(source)
+
+    def _find(self, fp):
+        for i, key in enumerate(bands(fp)):
+            for other in self.buckets.get((i, key), ()):
+                if hamming(fp, other['simhash']) <= self.max_distance:
+                    return other
+        return None
+
+    def add(self, items):
+        for item in items:
+            item.simhash = fingerprint(item.title, item.description)
+
+        stored = self.history_lookup({item.simhash for item in items}, self.max_distance) if self.history_lookup else {}
+
+        kept = []
+        batch_entries = []
+        for item in items:
+            fp = item.simhash
+            source = item.source
+
+            # 1. Same story already stored under another link
+            match = stored.get(fp)
+            if match is not None and match['link'] != item.link:
+                self._merge_into_stored(match['link'], match.get('sources') or [match['source']], source)
+                print(f"   [Dedup] '{item.title}' ({source}) duplicates stored '{match['title']}'")
+                continue
+
+            # 2. Same story earlier in this run
+            canonical = self._find(fp)
+            if canonical is not None:
+                if canonical['link'] != item.link:
+                    if canonical['emitted']:
+                        self._merge_into_stored(canonical['link'], canonical['sources'], source)
+                    else:
+                        if source not in canonical['sources']:
+                            canonical['sources'].append(source)
+                        for name, score in item.profiles.items():
+                            canonical['profiles'].setdefault(name, score)
+                continue
+
+            item.sources = [source]
+            kept.append(item)
+            entry = {"simhash": fp, "link": item.link, "sources": item.sources, "profiles": item.profiles, "emitted": False}
+            batch_entries.append(entry)
+            for i, key in enumerate(bands(fp)):
+                self.buckets.setdefault((i, key), []).append(entry)
+
+        for entry in batch_entries:
+            entry['emitted'] = True
+        return kept
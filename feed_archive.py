@@ -0,0 +1,159 @@
+import gzip
+import hashlib
+import io
+import json
+import os
+import threading
+
+from datetime import datetime, timezone
+
+import requests
+
+import atomic_file
+
+ARCHIVE_DIR = "data/archive"
+DEFAULT_KEEP_RUNS = 50 # Run listings kept; blobs only they reference are pruned with them
+
+class FeedArchive:
+    """
+    Content-addressed archive of raw feed responses (archive_feeds in app_config.json).
+    - Bodies are stored gzipped under objects/<sha1[:2]>/<sha1>.gz: a feed that did not change
+      since it was last archived costs nothing.
+    - Each run lists what every source returned in runs/<run id>.jsonl (replayed by ArchiveReplay);
+      a 304 points at the last archived body of the URL (latest.json).
+    - Thread safe, fetch workers share one instance.
+    """
+
+    def __init__(self, run_id, directory=ARCHIVE_DIR, keep_runs=DEFAULT_KEEP_RUNS):
+        self.run_id = run_id
+        self.directory = directory
+        self.keep_runs = keep_runs
+        self.latest = {}
+        self.stored = 0
+        self.unchanged = 0
+        self.bytes_stored = 0
+        self._records = []
+        self._lock = threading.Lock()
+        path = os.path.join(directory, "latest.json")
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.latest = json.load(f)
+            except (json.JSONDecodeError, OSError) as e:
+                print(f"Warning: Failed to load feed archive index ({e}).")
+
+    def _blob_path(self, sha):
+        return os.path.join(self.directory, "objects", sha[:2], sha + ".gz")
+
+    def has(self, url):
+        """True if url has an archived body (otherwise it should be fetched in full once)."""
+        with self._lock:
+            return url in self.latest
+
+    def record(self, name, url, body, content_type=None):
+        """Archives a 200 response body of source name."""
+        sha = hashlib.sha1(body).hexdigest()
+        path = self._blob_path(sha)
+        compressed = None
+        if not os.path.exists(path):
+            compressed = gzip.compress(body, mtime=0)
+        with self._lock:
+            if compressed is not None and not os.path.exists(path):
+                atomic_file.write_bytes(path, compressed)
+                self.stored += 1
+                self.bytes_stored += len(compressed)
+            else:
+                self.unchanged += 1
+            self.latest[url] = {"sha": sha, "content_type": content_type}
+            self._add(name, url, "ok", sha, content_type)
+
+    def record_not_modified(self, name, url):
+        """A 304: the run replays the last archived body of url."""
+        with self._lock:
+            known = self.latest.get(url)
+            if known:
+                self.unchanged += 1
+                self._add(name, url, "not_modified", known['sha'], known.get('content_type'))
+
+    def _add(self, name, url, status, sha, content_type):
+        self._records.append({"source": name, "url": url, "status": status, "sha": sha,
+                              "content_type": content_type, "fetched_at": datetime.now(timezone.utc).timestamp()})
+
+    def save(self):
+        """Writes this run's listing and the URL index, then prunes old runs."""
+        with self._lock:
+            records = list(self._records)
+            latest = dict(self.latest)
+        try:
+            if records:
+                body = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+                atomic_file.write_bytes(os.path.join(self.directory, "runs", f"{self.run_id}.jsonl"), body.encode('utf-8'))
+            atomic_file.write_json(os.path.join(self.directory, "latest.json"), latest)
+            self.prune(latest)
+        except Exception as e:
+            print(f"Error saving feed archive: {e}")
+
+    def prune(self, latest):
+        runs = list_runs(self.directory)
+        for run_id in runs[:-self.keep_runs] if self.keep_runs > 0 else []:
+            os.remove(os.path.join(self.directory, "runs", f"{run_id}.jsonl"))
+        live = {entry['sha'] for entry in latest.values()}
+        for run_id in list_runs(self.directory):
+            live.update(r['sha'] for r in _read_run(self.directory, run_id))
+        objects = os.path.join(self.directory, "objects")
+        for prefix in os.listdir(objects) if os.path.isdir(objects) else []:
+            for name in os.listdir(os.path.join(objects, prefix)):
+                if name.endswith(".gz") and name[:-3] not in live:
+                    os.remove(os.path.join(objects, prefix, name))
+
+    def summary(self):
+        return (f"Feed archive: {self.stored} new bodies ({self.bytes_stored / 1024:.1f} KB gzipped), "
+                f"{self.unchanged} unchanged.")
+
+def list_runs(directory=ARCHIVE_DIR):
+    """Archived run ids, oldest first."""
+    runs_dir = os.path.join(directory, "runs")
+    if not os.path.isdir(runs_dir):
+        return []
+    return sorted(name[:-6] for name in os.listdir(runs_dir) if name.endswith(".jsonl"))
+
+def _read_run(directory, run_id):
+    with open(os.path.join(directory, "runs", f"{run_id}.jsonl"), 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+class ArchiveReplay:
+    """
+    Serves an archived run in place of the network (fetch_news.py --replay).
+    - sources: {name: url} of the run, in the order they were archived.
+    - get(url): (a requests.Response built from the archived body, time of the original fetch),
+      so lookback windows are evaluated as they were in that run.
+    """
+
+    def __init__(self, run_id=None, directory=ARCHIVE_DIR):
+        runs = list_runs(directory)
+        if not runs:
+            raise FileNotFoundError(f"No archived runs in {directory} (enable archive_feeds first).")
+        if run_id in (None, "latest"):
+            run_id = runs[-1]
+        elif run_id not in runs:
+            raise FileNotFoundError(f"Archived run {run_id} not found ({len(runs)} runs in {directory}).")
+        self.run_id = run_id
+        self.directory = directory
+        self.records = {r['url']: r for r in _read_run(directory, run_id)}
+        self.sources = {r['source']: r['url'] for r in self.records.values()}
+
+    def get(self, url):
+        record = self.records[url]
+        with open(os.path.join(self.directory, "objects", record['sha'][:2], record['sha'] + ".gz"), 'rb') as f:
+            body = gzip.decompress(f.read())
+
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response._content = body
+        response.raw = io.BytesIO(body) # For the streaming parser
+        if record.get('content_type'):
+            response.headers['Content-Type'] = record['content_type']
+        # Same charset handling as a live response (requests decodes .text with it)
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        return response, datetime.fromtimestamp(record['fetched_at'], timezone.utc)
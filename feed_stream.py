@@ -0,0 +1,145 @@
+import time
+import xml.etree.ElementTree as ET
+
+from datetime import datetime, timezone
+from email.utils import parsedate_tz, mktime_tz
+
+import feedparser
+
+CHUNK_SIZE = 16 * 1024
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+RSS1 = "{http://purl.org/rss/1.0/}"
+DC = "{http://purl.org/dc/elements/1.1/}"
+CONTENT = "{http://purl.org/rss/1.0/modules/content/}"
+
+ENTRY_TAGS = {"item", RSS1 + "item", ATOM + "entry"}
+
+class StreamEntry(dict):
+    """Entry dict with attribute access, mirroring how fetch_rss_items uses feedparser entries."""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+def _parse_date(value):
+    # RFC 822 (RSS pubDate) or ISO 8601 (Atom, dc:date) -> UTC struct_time
+    if not value:
+        return None
+    value = value.strip()
+    parsed = parsedate_tz(value)
+    if parsed:
+        try:
+            return time.gmtime(mktime_tz(parsed))
+        except (OverflowError, ValueError):
+            return None
+    try:
+        dt = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc).timetuple()
+
+def _text(elem):
+    return (elem.text or "").strip() if elem is not None else ""
+
+def _to_entry(elem):
+    entry = StreamEntry()
+    for child in elem:
+        tag = child.tag
+        local = tag.rsplit('}', 1)[-1]
+        if local == "title" and "title" not in entry:
+            entry["title"] = _text(child)
+        elif local == "link":
+            # Atom: <link rel="alternate" href="..."/>, RSS: <link>...</link>
+            href = child.get("href")
+            if href and child.get("rel", "alternate") == "alternate":
+                entry.setdefault("link", href)
+            elif not href and _text(child):
+                entry.setdefault("link", _text(child))
+        elif tag in ("pubDate", ATOM + "published", DC + "date") and "published" not in entry:
+            entry["published"] = _text(child)
+        elif tag == ATOM + "updated":
+            entry["updated"] = _text(child)
+        elif tag in ("description", RSS1 + "description", ATOM + "summary"):
+            entry.setdefault("summary", child.text or "")
+        elif tag in (CONTENT + "encoded", ATOM + "content"):
+            entry.setdefault("content_html", child.text or "")
+
+    # Same fallbacks feedparser gives us: summary from content, parsed dates
+    if "summary" not in entry and "content_html" in entry:
+        entry["summary"] = entry["content_html"]
+    entry.pop("content_html", None)
+    if entry.get("published"):
+        entry["published_parsed"] = _parse_date(entry["published"])
+    if entry.get("updated"):
+        entry["updated_parsed"] = _parse_date(entry["updated"])
+    return entry
+
+class _RecordingReader:
+    """File-like wrapper over the response stream; keeps what was read for a feedparser fallback."""
+
+    def __init__(self, response):
+        self.raw = response.raw
+        self.raw.decode_content = True # gzip/br handled by urllib3
+        self.buffer = bytearray()
+
+    def read(self, size=CHUNK_SIZE):
+        data = self.raw.read(size)
+        self.buffer.extend(data)
+        return data
+
+    def read_rest(self):
+        rest = self.raw.read()
+        self.buffer.extend(rest)
+        return bytes(self.buffer)
+
+class FeedStream:
+    """
+    Incremental RSS/Atom parser over a streamed requests response (stream=True).
+    - entries() yields entries one by one while the body is still downloading, so the
+      caller can stop reading as soon as it has enough.
+    - Malformed XML, and encodings expat cannot decode (GBK, GB2312 ...), fall back to
+      feedparser on the full body (skipping entries already yielded), so those feeds still work.
+    """
+
+    def __init__(self, response):
+        self.response = response
+        self.reader = _RecordingReader(response)
+        self.bozo = False
+
+    @property
+    def bytes_read(self):
+        return len(self.reader.buffer)
+
+    def entries(self):
+        yielded = 0
+        try:
+            depth_stack = []
+            for event, elem in ET.iterparse(self.reader, events=("start", "end")):
+                if event == "start":
+                    depth_stack.append(elem)
+                    continue
+                depth_stack.pop()
+                if elem.tag in ENTRY_TAGS:
+                    entry = _to_entry(elem)
+                    # Free the finished entry, the tree never grows past one item
+                    elem.clear()
+                    if depth_stack:
+                        parent = depth_stack[-1]
+                        if len(parent) and parent[-1] is elem:
+                            parent.remove(elem)
+                    yielded += 1
+                    yield entry
+        except (ET.ParseError, ValueError):
+            # ValueError: expat has no multi-byte codecs, GBK / GB2312 feeds are parsed by feedparser
+            self.bozo = True
+            feed = feedparser.parse(self.reader.read_rest())
+            for entry in feed.entries[yielded:]:
+                yield entry
+
+    def close(self):
+        self.response.close()
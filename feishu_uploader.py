@@ -0,0 +1,149 @@
+import threading
+import time
+import uuid
+
+from concurrent.futures import ThreadPoolExecutor
+
+import http_client
+
+from token_manager import FEISHU_BASE_URL, TOKEN_INVALID_CODES, TokenManager, current_token
+
+FEISHU_BATCH_LIMIT = 500 # batch_create hard limit per request
+RATE_LIMIT_CODE = 99991400 # "request trigger frequency limit"
+
+DEFAULT_CHUNK_SIZE = 500
+DEFAULT_UPLOAD_WORKERS = 4
+DEFAULT_MAX_QPS = 5 # Well below the bitable write quota per app
+DEFAULT_MAX_ATTEMPTS = 4
+
+class RateLimiter:
+    """Spaces request starts at least 1/max_qps apart across threads."""
+
+    def __init__(self, max_qps):
+        self.interval = 1.0 / max_qps if max_qps > 0 else 0
+        self.next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def pause(self, seconds):
+        # Push every future slot out by at least 'seconds'
+        with self._lock:
+            self.next_slot = max(self.next_slot, time.monotonic() + seconds)
+
+def _retry_after(response):
+    for header in ('x-ogw-ratelimit-reset', 'Retry-After'):
+        value = response.headers.get(header)
+        if value:
+            try:
+                return max(float(value), 0)
+            except ValueError:
+                pass
+    return 1.0
+
+def _send_chunk(url, token, chunk, client_token):
+    # Returns (ok, retryable, error_message, retry_after_seconds, token_rejected)
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Content-Type": "application/json; charset=utf-8"
+    }
+    try:
+        # client_token makes a retried chunk idempotent on Feishu's side
+        response = http_client.get_session().post(
+            url, headers=headers, params={"client_token": client_token},
+            json={"records": chunk}, timeout=30
+        )
+    except Exception as e:
+        return False, True, f"Exception: {e}", None, False
+
+    try:
+        res_json = response.json()
+    except ValueError:
+        res_json = {}
+
+    if response.status_code == 429 or res_json.get("code") == RATE_LIMIT_CODE:
+        return False, True, f"Rate limited ({response.status_code})", _retry_after(response), False
+    if res_json.get("code") in TOKEN_INVALID_CODES:
+        return False, True, f"Token rejected ({res_json.get('code')})", None, True
+    if response.status_code >= 500:
+        return False, True, f"HTTP {response.status_code}: {response.text[:200]}", None, False
+    if response.status_code != 200 or res_json.get("code") != 0:
+        # Bad field/permission errors won't fix themselves, don't retry
+        return False, False, f"HTTP {response.status_code}: {res_json or response.text[:200]}", None, False
+    return True, False, None, None, False
+
+def batch_create(token, app_token, table_id, records, config=None, label="records"):
+    """
+    Uploads records ([{"fields": {...}}, ...]) via bitable batch_create.
+    - token: tenant token, or a TokenManager asked for a current token on every request
+      (refreshed proactively, and again if the API rejects it).
+    - Splits into chunks of at most 500 (API limit).
+    - Sends chunks concurrently under a shared rate limit.
+    - Retries only failed chunks (network, 5xx, rate limit), honoring the server's reset hint.
+    Returns the list of indexes (into records) that were uploaded successfully.
+    """
+    if not records:
+        return []
+
+    config = config or {}
+    chunk_size = min(int(config.get('feishu_chunk_size', DEFAULT_CHUNK_SIZE)), FEISHU_BATCH_LIMIT)
+    workers = max(1, int(config.get('feishu_upload_workers', DEFAULT_UPLOAD_WORKERS)))
+    max_attempts = max(1, int(config.get('feishu_max_attempts', DEFAULT_MAX_ATTEMPTS)))
+    limiter = RateLimiter(float(config.get('feishu_max_qps', DEFAULT_MAX_QPS)))
+
+    url = f"{FEISHU_BASE_URL}/open-apis/bitable/v1/apps/{app_token}/tables/{table_id}/records/batch_create"
+
+    chunks = []
+    for start in range(0, len(records), chunk_size):
+        chunks.append({
+            "start": start,
+            "records": records[start:start + chunk_size],
+            "client_token": str(uuid.uuid4()),
+            "attempts": 0,
+            "latency": 0.0,
+            "ok": False,
+            "error": None
+        })
+
+    def run(chunk):
+        chunk["attempts"] += 1
+        limiter.wait()
+        started = time.monotonic()
+        used = current_token(token)
+        ok, retryable, error, retry_after, rejected = _send_chunk(url, used, chunk["records"], chunk["client_token"])
+        chunk["latency"] = time.monotonic() - started
+        if rejected and isinstance(token, TokenManager):
+            token.invalidate(used)
+        if retry_after is not None:
+            # Server told us to back off: hold every worker, not just this one
+            limiter.pause(retry_after)
+        chunk["ok"] = ok
+        chunk["error"] = error
+        return retryable
+
+    pending = chunks
+    with ThreadPoolExecutor(max_workers=min(workers, len(chunks))) as executor:
+        for attempt in range(1, max_attempts + 1):
+            retryable = list(executor.map(run, pending))
+            pending = [c for c, retry in zip(pending, retryable) if not c["ok"] and retry]
+            if not pending:
+                break
+            if attempt < max_attempts:
+                print(f"   Retrying {len(pending)} failed chunk(s) of {label} (attempt {attempt + 1}/{max_attempts})...")
+                time.sleep(min(2 ** (attempt - 1), 10))
+
+    uploaded = []
+    for i, chunk in enumerate(chunks):
+        size = len(chunk["records"])
+        status = "ok" if chunk["ok"] else f"FAILED ({chunk['error']})"
+        print(f"   Chunk {i + 1}/{len(chunks)}: {size} {label}, {chunk['latency'] * 1000:.0f} ms, "
+              f"{chunk['attempts']} attempt(s), {status}")
+        if chunk["ok"]:
+            uploaded.extend(range(chunk["start"], chunk["start"] + size))
+    return uploaded
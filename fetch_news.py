@@ -1,57 +1,173 @@
 import feedparser
-import requests
-import re
+import threading
 
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone, timedelta
-
-def clean_html(raw_html):
-    # Retrieve text from HTML
-    cleanr = re.compile('<.*?>')
-    cleantext = re.sub(cleanr, '', raw_html)
-    return cleantext.strip()
-
-def fetch_rss_items(url, source_name, config, failed_log=None):
-    # Returns a list of dicts: [{'title':..., 'link':...}, ...]
-    # config: dict containing 'filter_keywords' and 'max_lookback_hours'
+from urllib.parse import urlparse
+
+DEFAULT_FETCH_CONCURRENCY = 16 # Total parallel feed downloads
+DEFAULT_PER_HOST_CONCURRENCY = 4 # Most feeds live on plink.anyfeeder.com, don't hammer it
+# Feishu text field limit is usually large, but let's be safe
+MAX_DESCRIPTION_LENGTH = 1000
+# Streaming stops at the first entry past the window only after this many newest-first steps,
+# so oldest-first feeds and old pinned first items are read in full
+SORTED_EVIDENCE = 2
+# Ranking picks the best of this many times a profile's max_items_per_source matches, then the
+# feed is not read further (the old stop at the cap, bounded rather than removed)
+RANK_POOL_FACTOR = 5
+
+_print_lock = threading.Lock()
+
+def _print_block(lines):
+    # One write, so other threads' prints land before or after the block, not inside it
+    with _print_lock:
+        print("\n".join(lines) + "\n", end="", flush=True)
+
+def _release(response):
+    # Hands a (streamed) response's connection back to the pool. The body of a 304 or an error
+    # is empty or short and is read first so the connection is reused; closing with unread data
+    # (a feed we stopped reading early, a parse error) drops the connection instead
+    if response.status_code == 304 or response.status_code >= 400:
+        try:
+            response.content
+        except Exception:
+            pass
+    response.close()
+
+def fetch_rss_items(url, source_name, config, failed_log=None, http_cache=None, metrics=None, profiles=None,
+                    archive=None, replay=None):
+    # Returns a list of NewsItem, each profile's max_items_per_source best scored matches
+    # config: dict containing 'filter_keywords' and 'max_lookback_hours' (and the ranker.Scorer weights)
+    # profiles: subscriptions to route entries to (default: the ones in config, see profiles.load_profiles);
+    #   every item's 'profiles' holds the ones it goes to and its score for each
     # failed_log: list to append error dicts to
-    print(f"Fetching news from {source_name}...")
+    # http_cache: optional HttpCache, enables conditional GET (304 -> nothing to parse)
+    # metrics: optional RunMetrics, gets this source's timings and counters
+    # archive: optional FeedArchive, keeps the raw response body
+    # replay: optional ArchiveReplay, serves the body (and the time it was fetched) instead of the network
+    # Workers run concurrently: the source's lines are printed as one block when it is done
+    lines = []
+    log = lines.append
+    log(f"Fetching news from {source_name}...")
     items = [] # Renamed to 'items' to match the function's return, 'news_items' in snippet
+    started = time.monotonic()
+    stats = {"status": "ok", "fetch_seconds": 0.0, "parse_seconds": 0.0, "bytes": 0,
+             "entries_seen": 0, "kept": 0, "skipped_keyword": 0, "skipped_old": 0, "skipped_cap": 0}
+    response = None
     try:
         headers = {
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
         }
-        response = requests.get(url, headers=headers, timeout=10)
-        print(f"Fetching news from {source_name}...") # Changed 'name' to 'source_name'
-        response.raise_for_status() # Keep this for error handling
-        rss_text = response.text # Define rss_text from response
-
-        # Parse RSS
-        feed = feedparser.parse(rss_text)
-
-        if feed.bozo:
-             print(f"Warning: Trouble parsing {source_name} feed (bozo exception). Continuing anyway...")
-
-        if not feed.entries:
-            print(f"No entries found for {source_name}.")
-            # Debug: print first 200 chars to see what we got
-            # print(f"Response snippet: {response.text[:200]}")
+        # A feed missing from the archive is fetched in full once, so a 304 always has a body to replay
+        if http_cache is not None and (archive is None or archive.has(url)):
+            headers.update(http_cache.conditional_headers(url))
+        # Streaming parse: entries are parsed while downloading and we stop reading early
+        streaming = config.get('streaming_parse', False)
+        fetched_at = None
+        if replay is not None:
+            response, fetched_at = replay.get(url)
+        else:
+            response = http_client.get_session().get(url, headers=headers, timeout=10, stream=streaming)
+        stats["fetch_seconds"] = time.monotonic() - started
+        if response.status_code == 304:
+            # Unchanged since last run, everything in it was already processed
+            stats["status"] = "not_modified"
+            log(f"   (Not modified since last run, skipping {source_name})")
+            http_cache.record_not_modified(url)
+            if archive is not None:
+                archive.record_not_modified(source_name, url)
             return items
+        response.raise_for_status() # Keep this for error handling
+        parse_started = time.monotonic()
 
-        count = 0
+        stream = None
+        if streaming:
+            stream = FeedStream(response)
+            entries = stream.entries()
+        else:
+            rss_text = response.text # Define rss_text from response
+
+            # Parse RSS
+            feed = feedparser.parse(rss_text)
+
+            if feed.bozo:
+                 log(f"Warning: Trouble parsing {source_name} feed (bozo exception). Continuing anyway...")
+
+            if not feed.entries:
+                log(f"No entries found for {source_name}.")
+                # Debug: print first 200 chars to see what we got
+                # print(f"Response snippet: {response.text[:200]}")
+                stats["bytes"] = len(response.content)
+                stats["parse_seconds"] = time.monotonic() - parse_started
+                if http_cache is not None:
+                    http_cache.record_response(url, response)
+                if archive is not None:
+                    archive.record(source_name, url, response.content, response.headers.get('Content-Type'))
+                return items
+            entries = feed.entries
+
+        # One matching pass for every profile: compiled once over all their keywords, entries are
+        # then routed by intersecting the hits with each profile's keywords
+        if profiles is None:
+            profiles = load_profiles(config)
+        matcher = keyword_matcher(profiles)
+        match_description = any(p.match_description for p in profiles)
+
+        max_hours = max(p.max_hours for p in profiles) # Widest window, narrower ones are applied per profile
+        now = fetched_at or datetime.now(timezone.utc)
+        now_ts = now.timestamp()
+        last_dt = None
+        date_sorted = True # Stays True while entries come newest first
+        descending = 0 # Entries seen that were older than the one before
+
+        candidates = []
+        # Matches still wanted per profile: a profile takes no more once its pool is used up, and
+        # the rest of the feed is skipped once every profile that matched anything so far has its
+        # pool (a profile without a single match by then is not waited for)
+        pool = {p.name: p.max_items * RANK_POOL_FACTOR for p in profiles}
+        active = set()
+        pool_full = False
+        over_pool = 0
         skipped = 0
-        for entry in feed.entries:
-            if count >= 10:  # Limit to 10 items per source
-                break
+        too_old = 0
+        seen = 0
+        stopped_early = False
+        for entry in entries:
+            seen += 1
+
+            if stream is not None:
+                # On a newest-first feed, the first entry past the window means all the rest are too
+                entry_time = entry.get('published_parsed') or entry.get('updated_parsed')
+                if entry_time:
+                    entry_dt = datetime(*entry_time[:6], tzinfo=timezone.utc)
+                    if last_dt is not None:
+                        if entry_dt > last_dt:
+                            date_sorted = False
+                        elif entry_dt < last_dt:
+                            descending += 1
+                    last_dt = entry_dt
+                    if date_sorted and descending >= SORTED_EVIDENCE and (now - entry_dt) > timedelta(hours=max_hours):
+                        stopped_early = True
+                        break
 
             title = entry.get('title', 'No Title') # Use .get for safety
             link = entry.get('link', 'No Link')   # Use .get for safety
 
-            title = entry.get('title', 'No Title') # Use .get for safety
-            link = entry.get('link', 'No Link')   # Use .get for safety
+            # Description/Summary
+            description = ""
+            if hasattr(entry, 'summary'):
+                description = entry.summary
+            elif hasattr(entry, 'description'):
+                description = entry.description
 
             # Keyword Filter
-            keywords = config.get('filter_keywords', [])
-            if not any(kw in title for kw in keywords):
+            title_hits = matcher.matches(title)
+            clean_desc = None
+            desc_hits = None
+            if match_description:
+                clean_desc = clean_html(description, MAX_DESCRIPTION_LENGTH)
+                desc_hits = matcher.matches(clean_desc)
+            if not title_hits and not desc_hits:
                 skipped += 1
                 continue
 
@@ -65,6 +181,8 @@ def fetch_rss_items(url, source_name, config, failed_log=None):
             
             # Default date string for Feishu
             date_str = time.strftime('%Y-%m-%d')
+            published_ts = time.time()
+            dated = False
             
             if published_time:
                 # Convert struct_time to datetime (UTC)
@@ -73,16 +191,17 @@ def fetch_rss_items(url, source_name, config, failed_log=None):
                     
                     # Update date_str from the actual parsed date
                     date_str = dt_object.strftime('%Y-%m-%d')
+                    published_ts = dt_object.timestamp()
+                    dated = True
 
                     # Check Time Range
-                    max_hours = config.get('max_lookback_hours', 24)
                     # Simple comparison: Current UTC time - published time
-                    now = datetime.now(timezone.utc)
                     if (now - dt_object) > timedelta(hours=max_hours):
                         # Item is too old
+                        too_old += 1
                         continue
                 except Exception as e:
-                    print(f"   [Date Warning] Failed to parse/compare date for '{title}': {e}. Keeping it.")
+                    log(f"   [Date Warning] Failed to parse/compare date for '{title}': {e}. Keeping it.")
             else:
                 # Fallback for naive string parsing if struct_time is missing (rare for standard RSS)
                 # We keep the old logic just as a backup for 'date_str', but can't strictly filter by hours comfortably.
@@ -92,52 +211,197 @@ def fetch_rss_items(url, source_name, config, failed_log=None):
                 elif hasattr(entry, 'updated'):
                     published = entry.updated
                 
-                if len(published) >= 10 and published[0:4].isdigit():
+                if len(published) >= 10 and published[0:4].isdigit() and day_timestamp(published):
                     date_str = published[0:10]
+                    published_ts = day_timestamp(published)
+
+
+            if clean_desc is None:
+                # Stops scanning once the length limit is reached (long full-text feeds)
+                clean_desc = clean_html(description, MAX_DESCRIPTION_LENGTH)
+            if desc_hits is None:
+                desc_hits = matcher.matches(clean_desc) # Scoring only, the filter stays title-only
+
+            # Route to every profile whose keywords hit and whose window the entry is in
+            routes = {}
+            hits = set()
+            matched = False
+            full = False
+            for profile in profiles:
+                profile_title_hits = title_hits & profile.keywords
+                profile_desc_hits = desc_hits & profile.keywords
+                profile_hits = profile_title_hits | profile_desc_hits if profile.match_description else profile_title_hits
+                if not profile_hits:
+                    continue
+                matched = True
+                if pool[profile.name] <= 0:
+                    full = True
+                    continue
+                if dated and now_ts - published_ts > profile.max_hours * 3600:
+                    continue
+                routes[profile.name] = profile.scorer.score(source_name, profile_title_hits, profile_desc_hits, published_ts, now_ts)
+                hits |= profile_hits
+            if not routes:
+                if full:
+                    over_pool += 1
+                elif matched:
+                    too_old += 1
+                else:
+                    skipped += 1
+                continue
 
+            # Parsed once here; later stages use the timestamp/day as they are
+            item = NewsItem(title, link, source_name, published_ts, clean_desc, sorted(hits), date_str)
+            item.profiles = routes
+            candidates.append(item)
+            for name in routes:
+                pool[name] -= 1
+            active.update(routes)
+            if all(pool[name] <= 0 for name in active):
+                pool_full = stopped_early = True
+                break
 
-            # Description/Summary
-            description = ""
-            if hasattr(entry, 'summary'):
-                description = entry.summary
-            elif hasattr(entry, 'description'):
-                description = entry.description
-            
-            clean_desc = clean_html(description)
-            # Limit description length (Feishu text field limit is usually large, but let's be safe, e.g. 1000 chars)
-            if len(clean_desc) > 1000:
-                clean_desc = clean_desc[:997] + "..."
-
-            print(f"{count+1}. {title}\n   Link: {link}")
-
-            items.append({ # Changed 'news_items' to 'items'
-                "title": title,
-                "link": link,
-                "source": source_name, # Use source_name
-                "date": date_str,
-                "description": clean_desc
-            })
-            count += 1
+        # Best scored matches instead of the first ones in feed order (per profile)
+        items = top_per_profile(candidates, profiles)
+        for n, item in enumerate(items, 1):
+            routed = f" -> {', '.join(item.profiles)}" if len(profiles) > 1 else ""
+            log(f"{n}. {item.title}\n   Link: {item.link}\n   Keywords: {', '.join(item.keywords)} (score {item.score:.2f}{routed})")
 
         if skipped > 0:
-            print(f"   (Skipped {skipped} items not matching keywords)")
+            log(f"   (Skipped {skipped} items not matching keywords)")
+        if len(candidates) > len(items):
+            log(f"   (Dropped {len(candidates) - len(items)} lower scored matches over the per source cap)")
+        if over_pool:
+            log(f"   (Skipped {over_pool} matches of profiles that already had {RANK_POOL_FACTOR}x their cap)")
+        if pool_full:
+            log(f"   (Ranked the first {len(candidates)} matches, {RANK_POOL_FACTOR}x the per source cap)")
+
+        body_size = None
+        if stream is not None:
+            body_size = stream.bytes_read
+            if stream.bozo:
+                log(f"Warning: Trouble parsing {source_name} feed (bozo exception). Fell back to feedparser.")
+            if seen == 0:
+                log(f"No entries found for {source_name}.")
+            elif stopped_early:
+                log(f"   (Stopped reading after {seen} entries, {body_size / 1024:.1f} KB)")
+            if archive is not None:
+                # The archive keeps the whole feed, not just the part parsed before stopping
+                archive.record(source_name, url, stream.reader.read_rest(), response.headers.get('Content-Type'))
+            stream.close()
+        elif archive is not None:
+            archive.record(source_name, url, response.content, response.headers.get('Content-Type'))
+
+        stats.update({
+            "parse_seconds": time.monotonic() - parse_started, # Includes the download when streaming
+            "bytes": body_size if body_size is not None else len(response.content),
+            "entries_seen": seen,
+            "kept": len(items),
+            "skipped_keyword": skipped,
+            "skipped_old": too_old,
+            "skipped_cap": len(candidates) - len(items) + over_pool
+        })
+
+        # Only remember validators once the body was fully processed
+        if http_cache is not None:
+            http_cache.record_response(url, response, body_size)
 
     except Exception as e:
-        print(f"Error fetching {source_name}: {e}")
+        stats["status"] = "error"
+        log(f"Error fetching {source_name}: {e}")
         if failed_log is not None:
              failed_log.append({
                  "RssTitle": source_name,
                  "RssUrl": url,
                  "ErrorMessage": str(e)
              })
+    finally:
+        if response is not None:
+            _release(response)
+        if metrics is not None:
+            stats["latency"] = time.monotonic() - started
+            metrics.record_source(source_name, stats)
+        log("-" * 40)
+        _print_block(lines)
 
-    print("-" * 40)
     return items # Changed 'news_items' to 'items'
 
+def fetch_all_sources(rss_sources, config, failed_log=None, http_cache=None, scheduler=None, metrics=None, sink=None, profiles=None,
+                      archive=None, replay=None):
+    # Fetches every source in rss_sources ({"Name": "URL", ...}) with a bounded thread pool.
+    # config: app config, reads 'fetch_concurrency' and 'per_host_concurrency'
+    # profiles: subscriptions every feed is routed to, each feed is still fetched and parsed once
+    # archive / replay: see fetch_rss_items
+    # scheduler: optional SourceScheduler, gets each source's outcome and latency
+    # sink: optional callable (name, items), gets each source's items from the worker as soon as
+    #   it is done (may block for backpressure); nothing is collected or returned then.
+    # Returned results and failed_log entries keep the config order. With a sink, items are
+    #   handed over in completion order instead: the first items land while slow feeds are still
+    #   downloading, at the cost of pushes/saves no longer following the config order.
+    max_workers = max(1, int(config.get('fetch_concurrency', DEFAULT_FETCH_CONCURRENCY)))
+    if profiles is None:
+        profiles = load_profiles(config)
+    per_host = max(1, int(config.get('per_host_concurrency', DEFAULT_PER_HOST_CONCURRENCY)))
+
+    host_semaphores = {}
+    for url in rss_sources.values():
+        if url:
+            host = urlparse(url).netloc
+            if host not in host_semaphores:
+                host_semaphores[host] = threading.BoundedSemaphore(per_host)
+
+    def fetch_one(name, url):
+        errors = []
+        with host_semaphores[urlparse(url).netloc]:
+            started = time.monotonic()
+            items = fetch_rss_items(url, name, config, errors, http_cache, metrics, profiles, archive, replay)
+            latency = time.monotonic() - started
+        if scheduler is not None:
+            scheduler.record(name, url, not errors, len(items), latency)
+        if sink is not None:
+            sink(name, items)
+            items = []
+        return items, errors
+
+    futures = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for name, url in rss_sources.items():
+            if url:
+                futures.append(executor.submit(fetch_one, name, url))
+            else:
+                print(f"Skipping source {name}: No URL provided.")
+
+        collected = []
+        for future in futures:
+            items, errors = future.result()
+            collected.extend(items)
+            if failed_log is not None:
+                failed_log.extend(errors)
+
+    return collected
+
+import argparse
 import json
 import os
+import signal
 import time
-from data_manager import save_data
+import traceback
+from data_manager import save_data, insert_items, export_views, find_near_duplicates, merge_sources
+import dedup
+from http_cache import HttpCache
+import http_client
+from feishu_uploader import batch_create
+from token_manager import get_manager
+from html_cleaner import clean_html
+from feed_stream import FeedStream
+from source_scheduler import SourceScheduler
+from metrics import RunMetrics
+from pipeline import Pipeline
+from run_journal import RunJournal, DEFAULT_RESUME_MAX_AGE_HOURS
+from feed_archive import FeedArchive, ArchiveReplay, DEFAULT_KEEP_RUNS
+from news_item import NewsItem, day_timestamp
+from profiles import load_profiles, keyword_matcher, top_per_profile, Digests
+from sync_index import DEFAULT_RETENTION_DAYS
 
 def load_config():
     try:
@@ -153,7 +417,9 @@ def load_config():
 def load_app_config():
     default_config = {
         "filter_keywords": ["存款", "理财", "经济"],
-        "max_lookback_hours": 24
+        "max_lookback_hours": 24,
+        "fetch_concurrency": DEFAULT_FETCH_CONCURRENCY,
+        "per_host_concurrency": DEFAULT_PER_HOST_CONCURRENCY
     }
     try:
         if os.path.exists('app_config.json'):
@@ -190,99 +456,27 @@ def get_feishu_config():
             
     return config
 
-TOKEN_FILE = "token.json"
-
-def get_tenant_access_token(app_id, app_secret):
-    # 1. Check Cache
-    if os.path.exists(TOKEN_FILE):
-        try:
-            with open(TOKEN_FILE, 'r') as f:
-                data = json.load(f)
-                if data.get('expire_time', 0) > time.time():
-                    # print("Using cached token")
-                    return data.get('tenant_access_token')
-        except:
-            pass
-
-    # 2. Fetch New Token
-    url = "https://open.feishu.cn/open-apis/auth/v3/tenant_access_token/internal"
-    headers = {"Content-Type": "application/json; charset=utf-8"}
-    data = {"app_id": app_id, "app_secret": app_secret}
-    
-    try:
-        response = requests.post(url, headers=headers, json=data)
-        response.raise_for_status()
-        res_json = response.json()
-        if res_json.get("code") == 0:
-            token = res_json.get("tenant_access_token")
-            expire = res_json.get("expire", 7200)
-            
-            # Save to cache (expire_time = now + expire - buffer)
-            with open(TOKEN_FILE, 'w') as f:
-                json.dump({
-                    "tenant_access_token": token,
-                    "expire_time": time.time() + expire - 60 
-                }, f)
-            
-            return token
-        else:
-            print(f"Feishu Auth Error: {res_json}")
-            return None
-    except Exception as e:
-        print(f"Feishu Auth Exception: {e}")
-        return None
-
-def push_to_feishu(token, app_token, table_id, records):
+def push_to_feishu(token, app_token, table_id, records, config=None):
+    # Returns the records that were actually uploaded
     if not records:
         print("No records to push.")
-        return
-        
-    url = f"https://open.feishu.cn/open-apis/bitable/v1/apps/{app_token}/tables/{table_id}/records/batch_create"
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json; charset=utf-8"
-    }
-    
-    records_payload = []
-    for r in records:
-        records_payload.append({
-            "fields": {
-                "Title": r['title'],
-                "Link": r['link'], 
-                "Source": r['source'],
-                "Date": int(time.mktime(time.strptime(r['date'], "%Y-%m-%d"))) * 1000, # Feishu Date expects timestamp in ms
-                "Description": r['description']
-            }
-        })
-        
-    data = {"records": records_payload}
-    
-    try:
-        # Batch max 500, we assume records usually < 100
-        response = requests.post(url, headers=headers, json=data)
-        
-        if response.status_code != 200:
-             print(f"Feishu API Error ({response.status_code}): {response.text}")
-        
-        response.raise_for_status()
-        res_json = response.json()
-        if res_json.get("code") == 0:
-            print(f"Successfully pushed {len(records)} records to Feishu.")
-        else:
-            print(f"Feishu Push Error: {res_json}")
-    except Exception as e:
-        print(f"Feishu Push Exception: {e}")
+        return []
 
-def push_errors_to_feishu(token, app_token, table_id, records):
+    records_payload = [{"fields": r.to_feishu_fields()} for r in records]
+
+    # Chunked (<= 500 per request), concurrent, retries only failed chunks
+    uploaded = batch_create(token, app_token, table_id, records_payload, config, label="records")
+    if len(uploaded) == len(records):
+        print(f"Successfully pushed {len(records)} records to Feishu.")
+    else:
+        print(f"Feishu Push Error: only {len(uploaded)}/{len(records)} records pushed.")
+    return [records[i] for i in uploaded]
+
+def push_errors_to_feishu(token, app_token, table_id, records, config=None):
     if not records:
         return
 
     print(f"Pushing {len(records)} error logs to Feishu...")
-    url = f"https://open.feishu.cn/open-apis/bitable/v1/apps/{app_token}/tables/{table_id}/records/batch_create"
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json; charset=utf-8"
-    }
 
     records_payload = []
     for r in records:
@@ -294,73 +488,385 @@ def push_errors_to_feishu(token, app_token, table_id, records):
             }
         })
 
-    data = {"records": records_payload}
-
-    try:
-        response = requests.post(url, headers=headers, json=data)
-        if response.status_code != 200:
-             print(f"Feishu Error Log Push Fail ({response.status_code}): {response.text}")
-        
-        # We don't raise status for error logging to avoid crashing the main flow
-        res_json = response.json()
-        if res_json.get("code") == 0:
-            print(f"Successfully pushed error logs.")
-        else:
-            print(f"Feishu Error Log Push Error: {res_json}")
-    except Exception as e:
-        print(f"Feishu Error Log Push Exception: {e}")
-
-def main():
-    print("Starting NewsBot Fetcher...\n" + "="*40)
-    
-    sources = load_config()
-    collected_records = []
+    # Failures are only printed, error logging must not crash the main flow
+    uploaded = batch_create(token, app_token, table_id, records_payload, config, label="error logs")
+    if len(uploaded) == len(records):
+        print(f"Successfully pushed error logs.")
+    else:
+        print(f"Feishu Error Log Push Error: only {len(uploaded)}/{len(records)} error logs pushed.")
+
+def history_lookup(app_config):
+    # Near-duplicates are only looked up among recently published stored stories
+    window = app_config.get('near_duplicate_window_hours', dedup.DEFAULT_HISTORY_WINDOW_HOURS)
+    return lambda fingerprints, max_distance: find_near_duplicates(fingerprints, max_distance, window)
+
+CONFIG_FILES = ("rss_config.json", "app_config.json")
+DEFAULT_DAEMON_INTERVAL_MINUTES = 30
+
+class FetchState:
+    """
+    What a fetch cycle needs that is worth keeping warm between cycles in daemon mode:
+    parsed configs, the subscription profiles (with their synced-link indexes), the HTTP
+    validator cache and the source scheduler.
+    (Connection pools and keyword matchers are kept by http_client / keyword_matcher.)
+    - refresh() reloads the configs when either file changed on disk and rebuilds the
+      objects that depend on them from their saved state.
+    """
+
+    def __init__(self):
+        self.config_mtimes = None
+        self.rss_sources = {}
+        self.app_config = {}
+        self.http_cache = None
+        self.scheduler = None
+        self.profiles = []
+        self.run_interval = None # Seconds until the next cycle when resident (scheduler default otherwise)
+
+    def reset(self):
+        """
+        Drops the warm state after a failed cycle, so the next refresh() reloads it from disk
+        (validators of sources whose items never landed must not be reused).
+        """
+        self.config_mtimes = None
+
+    def _mtimes(self):
+        return tuple(os.path.getmtime(p) if os.path.exists(p) else None for p in CONFIG_FILES)
+
+    def refresh(self):
+        """Returns True when the configs were (re)loaded."""
+        mtimes = self._mtimes()
+        if mtimes == self.config_mtimes:
+            return False
+        reload = self.config_mtimes is not None
+        self.config_mtimes = mtimes
+
+        # Load RSS sources
+        self.rss_sources = load_config()
+
+        # Load App Config
+        previous = self.app_config
+        app_config = self.app_config = load_app_config()
+        self.profiles = load_profiles(app_config, get_feishu_config())
+        print(f"{'Reloaded' if reload else 'Loaded'} config: Keywords={app_config.get('filter_keywords')}, Max Hours={app_config.get('max_lookback_hours')}")
+        if app_config.get('profiles'):
+            print(f"Profiles: {', '.join(repr(p) for p in self.profiles)}")
+        if not reload or any(previous.get(k) != app_config.get(k) for k in http_client.CONFIG_KEYS):
+            http_client.configure(app_config) # Rebuilding the session drops pooled connections
+
+        # Conditional GET cache, invalidated whenever the filter or ranking settings change
+        self.http_cache = HttpCache(signature=json.dumps([
+            p.signature() for p in self.profiles
+        ], ensure_ascii=False, sort_keys=True))
+        self.http_cache.load()
+
+        # Adaptive polling: only fetch sources that are due (busy ones more often, failing ones back off)
+        self.scheduler = None
+        if app_config.get('adaptive_polling', False):
+            self.scheduler = SourceScheduler(app_config)
+            self.scheduler.load()
+
+        for profile in self.profiles:
+            profile.load_sync_index(app_config.get('synced_retention_days', DEFAULT_RETENTION_DAYS))
+        return True
+
+def run_cycle(state):
+    """One fetch -> dedup -> Feishu -> database pass using (and updating) state."""
+    state.refresh()
+    rss_sources = state.rss_sources
+    app_config = state.app_config
+    http_cache = state.http_cache
+    scheduler = state.scheduler
+    profiles = state.profiles
     failed_feeds = []
-    current_date = time.strftime("%Y-%m-%d") # Keep this for potential fallback or metadata
 
-    # Load RSS sources
-    rss_sources = load_config()
-    
     if not rss_sources:
-        print("No RSS sources loaded. Exiting.")
+        print("No RSS sources loaded.")
         return
 
-    # Load App Config
-    app_config = load_app_config()
-    print(f"Loaded config: Keywords={app_config.get('filter_keywords')}, Max Hours={app_config.get('max_lookback_hours')}")
+    http_cache.reset_stats()
+    due_sources = rss_sources
+    if scheduler is not None:
+        due_sources, not_due = scheduler.due(rss_sources, run_interval=state.run_interval)
+        print(f"Scheduler: polling {len(due_sources)}/{len(rss_sources)} sources ({len(not_due)} not due yet).")
+
+    # Per-stage timings and per-source counters for this run
+    metrics = RunMetrics()
+
+    # Checkpoints: every source whose items all landed is journaled with its validators and
+    # poll state, so a crashed or timed out run is resumed by the next one instead of redone
+    def snapshot(name):
+        url = rss_sources[name]
+        return {"url": url, "cache": http_cache.entry(url),
+                "schedule": scheduler.entry(name) if scheduler is not None else None}
+    journal = RunJournal(snapshot, max_age_hours=app_config.get('resume_max_age_hours', DEFAULT_RESUME_MAX_AGE_HOURS))
+    resumed = journal.start(metrics.run_id)
+    for name, record in resumed.items():
+        if rss_sources.get(name) == record.get('url'):
+            http_cache.restore(record['url'], record.get('cache'))
+            if scheduler is not None:
+                scheduler.restore(name, record.get('schedule'))
+    if resumed:
+        due_sources = {name: url for name, url in due_sources.items() if name not in resumed}
+        print(f"Resume: {len(due_sources)} sources left to fetch.")
+    # Validators and poll state before this run, put back for sources whose records did not reach
+    # Feishu: otherwise the next run gets a 304 and never sees (or pushes) them again
+    before = {name: snapshot(name) for name in due_sources}
+    unpushed = set()
+
+    # Raw responses for debugging and offline re-processing (--replay)
+    archive = None
+    if app_config.get('archive_feeds', False):
+        archive = FeedArchive(metrics.run_id, keep_runs=int(app_config.get('archive_keep_runs', DEFAULT_KEEP_RUNS)))
 
-    # rss_sources is a dict: {"Name": "URL", ...}
-    for name, url in rss_sources.items():
-        if url:
-            items = fetch_rss_items(url, name, app_config, failed_feeds)
-            if items:
-                collected_records.extend(items)
-        else:
-            print(f"Skipping source {name}: No URL provided.")
-            
     # Feishu Integration
     feishu_conf = get_feishu_config()
-    if all(feishu_conf.values()):
-        print("Pushing to Feishu...")
-        token = get_tenant_access_token(feishu_conf['app_id'], feishu_conf['app_secret'])
-        if token:
-            push_to_feishu(token, feishu_conf['app_token'], feishu_conf['table_id'], collected_records)
-            
-            # Push errors if any and if error_table_id is configured
-            if failed_feeds and feishu_conf.get('error_table_id'):
-                # Use error_app_token if provided, otherwise fallback to main app_token (backward compatibility)
-                err_token = feishu_conf.get('error_app_token') or feishu_conf['app_token']
-                push_errors_to_feishu(token, err_token, feishu_conf['error_table_id'], failed_feeds)
+    token = None
+    token_failed = False
+    pushing = [p for p in profiles if p.pushes]
+    if feishu_conf['app_id'] and feishu_conf['app_secret'] and pushing:
+        # Shared token manager: uploads ask it for a current token per request
+        token = get_manager(feishu_conf['app_id'], feishu_conf['app_secret'])
+        if not token.get():
+            token = None
+            token_failed = True
     else:
         print("Feishu config missing. Skipping upload.")
 
-    # Save to Local JSON Database (for Web Display)
-    if collected_records:
+    # Items flow fetchers -> bounded queue -> micro-batches -> dedup -> Feishu -> store,
+    # so data lands while slow feeds are still downloading and a crash keeps what landed
+    pipeline = Pipeline(app_config)
+    collapser = None
+    if app_config.get('near_duplicate_detection', True):
+        # Collapse syndicated copies of the same story, within this run and against the stored history
+        collapser = dedup.Collapser(history_lookup(app_config), app_config.get('near_duplicate_distance', dedup.DEFAULT_MAX_DISTANCE))
+    # Ranked digests: only the digest_size best scored items of the whole run go on to a profile
+    # that has one. They are known once every source is in, so the first batch waits for the slowest feed
+    digests = Digests(profiles)
+    landed_dates = set()
+    added_total = 0
+    started = time.monotonic()
+
+    def process_batch(batch):
+        nonlocal added_total
+        metrics.count("records_fetched", len(batch))
+        records = batch
+        if collapser is not None:
+            with metrics.stage("dedup"):
+                records = collapser.add(batch)
+            metrics.count("near_duplicates", len(batch) - len(records))
+
+        failed = set()
+        for profile in pushing if token is not None or token_failed else ():
+            routed = [r for r in records if profile.name in r.profiles]
+            if not routed:
+                continue
+            if token is None:
+                failed.update(r.source for r in routed)
+                continue
+            # Only push links that previous runs (and earlier batches) haven't already uploaded to this table
+            sync_index = profile.sync_index
+            new_records = sync_index.filter_new(routed)
+            if new_records:
+                label = f" ({profile.name})" if len(profiles) > 1 else ""
+                print(f"Pushing {len(new_records)} new records to Feishu{label} ({len(routed) - len(new_records)} already synced)...")
+                with metrics.stage("feishu_push"):
+                    pushed = push_to_feishu(token, profile.app_token, profile.table_id, new_records, app_config)
+                metrics.count("records_pushed", len(pushed))
+                metrics.count("records_push_failed", len(new_records) - len(pushed))
+                sync_index.mark(pushed)
+                sync_index.save()
+                pushed_ids = {id(r) for r in pushed}
+                failed.update(r.source for r in new_records if id(r) not in pushed_ids)
+
+        with metrics.stage("db_write"):
+            added_total += insert_items(records)
+        landed_dates.update(r.date for r in records)
+        unpushed.update(failed)
+        journal.landed(batch, failed)
+
+    fetched = []
+    producer_error = []
+    def deliver(name, items):
+        if digests:
+            digests.add(items)
+            fetched.append(name)
+        else:
+            journal.expect(name, items)
+            pipeline.put(items)
+
+    def produce():
+        try:
+            # rss_sources is a dict: {"Name": "URL", ...}
+            with metrics.stage("fetch"):
+                fetch_all_sources(due_sources, app_config, failed_feeds, http_cache, scheduler, metrics,
+                                  sink=deliver, profiles=profiles, archive=archive)
+            if digests:
+                selected = digests.items()
+                print(f"Digest: kept {len(selected)} of {digests.seen} matched items.")
+                metrics.count("digest_dropped", digests.seen - len(selected))
+                by_source = {}
+                for item in selected:
+                    by_source.setdefault(item.source, []).append(item)
+                for name in fetched:
+                    journal.expect(name, by_source.get(name, ()))
+                pipeline.put(selected)
+        except BaseException as e:
+            # Re-raised by run_cycle once what landed is exported
+            producer_error.append(e)
+        finally:
+            pipeline.close()
+
+    producer = threading.Thread(target=produce, name="fetch-producer", daemon=True)
+    producer.start()
+    try:
+        pipeline.run(process_batch)
+    finally:
+        producer.join()
+        journal.close()
+        if archive is not None:
+            archive.save()
+            print(archive.summary())
+        # Whatever landed is exported even if the run failed halfway
         print("-" * 40)
         print("Updating Local Database...")
-        save_data(collected_records)
+        with metrics.stage("db_write"):
+            export_views(landed_dates, added_total)
+            if collapser is not None:
+                merge_sources(collapser.history_merges)
+    if producer_error:
+        # Sources that never landed stay unjournaled and are fetched again by the resumed run
+        raise producer_error[0]
+
+    if pipeline.first_batch_at is not None:
+        print(f"Pipeline: {pipeline.batches} batches, first batch landed after {pipeline.first_batch_at - started:.1f}s.")
+
+    # Validators and poll state are only saved once every fetched item has landed,
+    # otherwise a crash would turn the lost items into 304s next run
+    for name in unpushed:
+        http_cache.restore(before[name]['url'], before[name]['cache'])
+        if scheduler is not None:
+            scheduler.restore(name, before[name]['schedule'])
+    if unpushed:
+        print(f"Feishu: {len(unpushed)} sources have unpushed records, they are fetched in full again next run.")
+    http_cache.save()
+    print(http_cache.summary())
+    if scheduler is not None:
+        scheduler.save(rss_sources)
+        print(scheduler.summary())
+    journal.complete() # Everything is saved, nothing left to resume
+
+    # Push errors if any and if error_table_id is configured
+    if token is not None and failed_feeds and feishu_conf.get('error_table_id'):
+        # Use error_app_token if provided, otherwise fallback to main app_token (backward compatibility)
+        err_token = feishu_conf.get('error_app_token') or feishu_conf['app_token'] or pushing[0].app_token
+        with metrics.stage("feishu_errors"):
+            push_errors_to_feishu(token, err_token, feishu_conf['error_table_id'], failed_feeds, app_config)
 
+    print("-" * 40)
+    print(http_client.connection_summary())
+    print(metrics.summary())
+    print(f"Metrics written to {metrics.write_jsonl()}")
+    if app_config.get('metrics_prometheus_file'):
+        metrics.write_prometheus(app_config['metrics_prometheus_file'])
     print("Done.")
 
+def main():
+    print("Starting NewsBot Fetcher...\n" + "="*40)
+    run_cycle(FetchState())
+
+def run_replay(run_id=None):
+    """
+    Re-runs parse -> filter -> dedup -> store on an archived run (archive_feeds) with the current
+    keywords and profiles, entirely offline. Lookback windows use the original fetch times, so a
+    replay gives the same result every time. Nothing is pushed to Feishu and no fetch state
+    (HTTP cache, poll state, sync indexes) is touched.
+    """
+    print("Starting NewsBot Replay...\n" + "="*40)
+    state = FetchState()
+    state.refresh()
+    app_config = state.app_config
+    replay = ArchiveReplay(run_id)
+    print(f"Replaying archived run {replay.run_id}: {len(replay.sources)} sources.")
+
+    metrics = RunMetrics()
+    failed_feeds = []
+    with metrics.stage("fetch"):
+        items = fetch_all_sources(replay.sources, app_config, failed_feeds, metrics=metrics,
+                                  profiles=state.profiles, replay=replay)
+    metrics.count("records_fetched", len(items))
+
+    digests = Digests(state.profiles)
+    if digests:
+        digests.add(items)
+        items = digests.items()
+        metrics.count("digest_dropped", digests.seen - len(items))
+
+    collapser = None
+    if app_config.get('near_duplicate_detection', True):
+        collapser = dedup.Collapser(history_lookup(app_config), app_config.get('near_duplicate_distance', dedup.DEFAULT_MAX_DISTANCE))
+        with metrics.stage("dedup"):
+            kept = collapser.add(items)
+        metrics.count("near_duplicates", len(items) - len(kept))
+        items = kept
+
+    print("-" * 40)
+    print("Updating Local Database...")
+    with metrics.stage("db_write"):
+        save_data(items)
+        if collapser is not None:
+            merge_sources(collapser.history_merges)
+
+    print("-" * 40)
+    print(metrics.summary())
+    print("Done.")
+
+def run_daemon(interval_minutes=None):
+    """
+    Stays resident and runs a cycle every interval (daemon_interval_minutes in app_config.json,
+    or --interval). Config files are re-read when they change; SIGTERM / Ctrl-C stop the
+    daemon between cycles.
+    """
+    print("Starting NewsBot Fetcher (daemon)...\n" + "="*40)
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+
+    state = FetchState()
+    cycle = 0
+    try:
+        while not stop.is_set():
+            cycle += 1
+            started = time.monotonic()
+            print(f"\n=== Cycle {cycle} ({time.strftime('%Y-%m-%d %H:%M:%S')}) ===")
+            try:
+                # Configs first: the scheduler needs this cycle's interval (daemon_interval_minutes)
+                state.refresh()
+                state.run_interval = float(interval_minutes or state.app_config.get('daemon_interval_minutes', DEFAULT_DAEMON_INTERVAL_MINUTES)) * 60
+                run_cycle(state)
+            except Exception:
+                # A bad cycle (network outage, broken config) must not kill the daemon;
+                # the next one resumes it from the journal
+                traceback.print_exc()
+                state.reset()
+
+            minutes = interval_minutes or state.app_config.get('daemon_interval_minutes', DEFAULT_DAEMON_INTERVAL_MINUTES)
+            elapsed = time.monotonic() - started
+            wait = max(float(minutes) * 60 - elapsed, 0)
+            print(f"Cycle took {elapsed:.1f}s. Next cycle in {wait / 60:.1f} min.")
+            stop.wait(wait)
+    except KeyboardInterrupt:
+        pass
+    print("Daemon stopped.")
+
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Fetches RSS sources, pushes new items to Feishu and updates data/")
+    parser.add_argument("--daemon", action="store_true", help="stay resident and fetch on an interval")
+    parser.add_argument("--interval", type=float, help="minutes between daemon cycles (default: daemon_interval_minutes)")
+    parser.add_argument("--replay", nargs="?", const="latest", metavar="RUN_ID",
+                        help="re-process an archived run offline (default: the latest); see archive_feeds")
+    args = parser.parse_args()
+    if args.replay:
+        run_replay(args.replay)
+    elif args.daemon:
+        run_daemon(args.interval)
+    else:
+        main()
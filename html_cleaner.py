@@ -0,0 +1,62 @@
+import html
+import re
+
+# Comments and script/style blocks are dropped with their content (unclosed ones run to the end)
+_BLOCKS = re.compile(r'<!--.*?(?:-->|\Z)|<(script|style|noscript)\b.*?(?:</\1\s*>|\Z)', re.S | re.I)
+# Tags that separate words become a space, every other tag disappears
+_BREAK_TAGS = re.compile(
+    r'</?(?:br|p|div|li|ul|ol|tr|td|th|table|h[1-6]|blockquote|section|article|hr)\b[^>]*>',
+    re.I
+)
+# A tag starts with a name, '/', '!' or '?' (so "a < b" survives); a cut-off tag at the end is dropped
+_TAGS = re.compile(r'<[A-Za-z/!?][^>]*(?:>|\Z)')
+# Cheap substring checks that tell whether whitespace needs collapsing at all
+_WHITESPACE_HINTS = ('  ', '\n', '\r', '\t', '\xa0', '\u3000')
+
+def _clean(fragment):
+    text = fragment
+    if '<' in text:
+        text = _BLOCKS.sub('', text)
+        text = _BREAK_TAGS.sub(' ', text)
+        text = _TAGS.sub('', text)
+    if '&' in text:
+        text = html.unescape(text)
+    if any(hint in text for hint in _WHITESPACE_HINTS):
+        # str.split() collapses (unicode) whitespace far faster than a \s+ regex on CJK text
+        return ' '.join(text.split())
+    return text.strip()
+
+def clean_html(raw_html, max_len=None):
+    """
+    Converts an HTML fragment to plain text.
+    - Strips tags, comments and script/style content.
+    - Decodes entities (&amp;, &nbsp;, &#8220; ...).
+    - Collapses whitespace.
+    - max_len: only a growing prefix of the markup is cleaned until the budget is
+      filled, so long full-text bodies aren't processed in full. Truncated text
+      ends with "...".
+    """
+    if not raw_html:
+        return ""
+    if max_len is None:
+        return _clean(raw_html)
+
+    # Start with a prefix a few times the budget (markup overhead) and grow it if needed
+    window = max(max_len * 4, 4096)
+    while True:
+        if window >= len(raw_html):
+            text = _clean(raw_html)
+            break
+        # Cut right after a '>' so no tag or entity is split
+        cut = raw_html.find('>', window)
+        if cut == -1:
+            text = _clean(raw_html)
+            break
+        text = _clean(raw_html[:cut + 1])
+        if len(text) > max_len:
+            break
+        window *= 4
+
+    if len(text) > max_len:
+        text = text[:max_len - 3] + "..."
+    return text
@@ -0,0 +1,114 @@
+import json
+import os
+import threading
+
+import atomic_file
+
+CACHE_FILE = "data/http_cache.json"
+
+class HttpCache:
+    """
+    Persistent per-URL HTTP validator cache (ETag / Last-Modified).
+    - Stored as JSON next to the news database.
+    - 'signature' ties the cache to the filter config: if keywords change,
+      cached validators are dropped so unchanged feeds get re-filtered.
+    - Thread safe, fetch workers share one instance.
+    """
+
+    def __init__(self, path=CACHE_FILE, signature=None):
+        self.path = path
+        self.signature = signature
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.bytes_downloaded = 0
+        self._lock = threading.Lock()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            print(f"Warning: Failed to load HTTP cache ({e}). Starting empty.")
+            return
+
+        if data.get('signature') != self.signature:
+            print("HTTP cache signature changed (filter config updated). Ignoring cached validators.")
+            return
+        self.entries = data.get('entries', {})
+
+    def save(self):
+        with self._lock:
+            data = {"signature": self.signature, "entries": dict(self.entries)}
+        try:
+            atomic_file.write_json(self.path, data)
+        except Exception as e:
+            print(f"Error saving HTTP cache: {e}")
+
+    def reset_stats(self):
+        """Starts a new run's hit/miss counters (daemon mode keeps one instance)."""
+        with self._lock:
+            self.hits = self.misses = 0
+            self.bytes_saved = self.bytes_downloaded = 0
+
+    def entry(self, url):
+        """Validators stored for url (None if there are none), see restore."""
+        with self._lock:
+            entry = self.entries.get(url)
+            return dict(entry) if entry else None
+
+    def restore(self, url, entry):
+        """Puts back an entry taken with entry(), e.g. from a resumed run's journal."""
+        with self._lock:
+            if entry:
+                self.entries[url] = entry
+            else:
+                self.entries.pop(url, None)
+
+    def conditional_headers(self, url):
+        """Returns If-None-Match / If-Modified-Since headers for url (may be empty)."""
+        with self._lock:
+            entry = self.entries.get(url)
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def record_not_modified(self, url):
+        """Call on a 304 response."""
+        with self._lock:
+            self.hits += 1
+            self.bytes_saved += self.entries.get(url, {}).get('size', 0)
+
+    def record_response(self, url, response, size=None):
+        """
+        Call after a 200 response has been processed successfully.
+        size: bytes actually read, for streamed responses that were not read to the end.
+        """
+        if size is None:
+            size = len(response.content)
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        with self._lock:
+            self.misses += 1
+            self.bytes_downloaded += size
+            if etag or last_modified:
+                self.entries[url] = {
+                    "etag": etag,
+                    "last_modified": last_modified,
+                    "size": size
+                }
+            else:
+                self.entries.pop(url, None)
+
+    def summary(self):
+        total = self.hits + self.misses
+        return (f"HTTP cache: {self.hits}/{total} not modified, "
+                f"{self.bytes_saved / 1024:.1f} KB saved, "
+                f"{self.bytes_downloaded / 1024:.1f} KB downloaded.")
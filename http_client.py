@@ -0,0 +1,121 @@
+import threading
+from collections import Counter
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import make_headers
+from urllib3.util.retry import Retry
+
+DEFAULT_RETRIES = 2 # Retries on connection errors / 429 / 5xx
+DEFAULT_BACKOFF = 0.5 # Seconds, doubled on every retry
+DEFAULT_MAX_RETRY_AFTER = 10 # Seconds; a longer Retry-After would stall the worker (and the run)
+POOL_MAXSIZE = 32 # Keep-alive connections per host (>= fetch/verify worker count)
+POOL_HOSTS = 64 # Number of per-host pools kept open
+# app_config.json settings read by configure(); a change needs a new session
+CONFIG_KEYS = ('http_retries', 'http_backoff', 'http_max_retry_after')
+
+# gzip/deflate always, br only when brotli is installed (urllib3 can't decode it otherwise)
+ACCEPT_ENCODING = make_headers(accept_encoding=True)['accept-encoding']
+
+_session = None
+_session_lock = threading.Lock()
+_settings = {"retries": DEFAULT_RETRIES, "backoff": DEFAULT_BACKOFF, "max_retry_after": DEFAULT_MAX_RETRY_AFTER}
+
+_request_counts = Counter()
+_counts_lock = threading.Lock()
+
+def _count_request(response, *args, **kwargs):
+    # Response hook: count requests per origin for the connection reuse summary
+    parsed = urlparse(response.url)
+    with _counts_lock:
+        _request_counts[f"{parsed.scheme}://{parsed.netloc}"] += 1
+
+class CappedRetry(Retry):
+    """Retry that honours Retry-After for at most max_retry_after seconds."""
+
+    def __init__(self, *args, max_retry_after=DEFAULT_MAX_RETRY_AFTER, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_retry_after = max_retry_after
+
+    def new(self, **kw):
+        # urllib3 copies the Retry for every attempt
+        retry = super().new(**kw)
+        retry.max_retry_after = self.max_retry_after
+        return retry
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, self.max_retry_after)
+
+def _build_session():
+    retry = CappedRetry(
+        total=_settings["retries"],
+        backoff_factor=_settings["backoff"],
+        status_forcelist=(429, 500, 502, 503, 504),
+        respect_retry_after_header=True,
+        max_retry_after=_settings["max_retry_after"],
+        raise_on_status=False # Hand the last response back, callers check status themselves
+    )
+    adapter = HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=POOL_MAXSIZE, max_retries=retry)
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers['Accept-Encoding'] = ACCEPT_ENCODING
+    session.hooks['response'].append(_count_request)
+    return session
+
+def configure(config):
+    """
+    Applies retry settings from app config (CONFIG_KEYS).
+    Rebuilds the shared session if it already exists.
+    """
+    global _session
+    with _session_lock:
+        _settings["retries"] = int(config.get('http_retries', DEFAULT_RETRIES))
+        _settings["backoff"] = float(config.get('http_backoff', DEFAULT_BACKOFF))
+        _settings["max_retry_after"] = float(config.get('http_max_retry_after', DEFAULT_MAX_RETRY_AFTER))
+        if _session is not None:
+            _session.close()
+            _session = None
+
+def get_session():
+    """Returns the process-wide pooled session (keep-alive, compression, retries)."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+def connection_stats():
+    """Returns {origin: (requests, connections_opened)} for every origin used so far."""
+    session = get_session()
+    with _counts_lock:
+        counts = dict(_request_counts)
+
+    # Sum connections over every live pool for the origin (requests may key pools by TLS settings too)
+    opened_by_origin = Counter()
+    for adapter in set(session.adapters.values()):
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                opened_by_origin[f"{key.key_scheme}://{pool.host}:{pool.port}"] += pool.num_connections
+
+    stats = {}
+    for origin, count in counts.items():
+        parsed = urlparse(origin)
+        port = parsed.port or (443 if parsed.scheme == "https" else 80)
+        stats[origin] = (count, opened_by_origin[f"{parsed.scheme}://{parsed.hostname}:{port}"])
+    return stats
+
+def connection_summary():
+    lines = ["Connection reuse (requests / new connections):"]
+    for origin, (count, opened) in sorted(connection_stats().items()):
+        reused = max(count - opened, 0)
+        lines.append(f"   {urlparse(origin).netloc}: {count} requests / {opened} connections ({reused} reused)")
+    return "\n".join(lines)
@@ -0,0 +1,120 @@
+import re
+
+from functools import lru_cache
+
+def _build_trie(keywords):
+    root = {}
+    for kw in keywords:
+        node = root
+        for ch in kw:
+            node = node.setdefault(ch, {})
+        node[''] = True # End of keyword
+    return root
+
+def _trie_to_regex(node):
+    # Shared prefixes become nested groups, so the regex engine walks a trie
+    # instead of trying every keyword at every position.
+    branches = []
+    leaves = []
+    for ch in sorted(k for k in node if k):
+        child = node[ch]
+        if len(child) == 1 and '' in child:
+            leaves.append(re.escape(ch))
+        else:
+            branches.append(re.escape(ch) + _trie_to_regex(child))
+
+    if leaves:
+        branches.append(leaves[0] if len(leaves) == 1 else '[' + ''.join(leaves) + ']')
+
+    pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+    if '' in node:
+        # A keyword ends here but longer ones continue: greedy optional keeps the longest
+        pattern = '(?:' + pattern + ')?'
+    return pattern
+
+# Above this many distinct first characters one big alternation gets slow (sre tries
+# every branch at every position), so dispatch on the first character instead
+DISPATCH_THRESHOLD = 64
+
+class KeywordMatcher:
+    """
+    Multi-keyword substring matcher compiled from a keyword trie.
+    - search(text): True if any keyword occurs in text (same result as any(kw in text ...)).
+    - matches(text): set of every keyword that occurs in text, overlaps included.
+    Small lists compile to one regex for search(); matches() checks them one by one,
+    which beats reporting overlapping regex matches at that size. Large lists find
+    candidate positions with a first-character class and run a small per-character
+    regex there, so the cost stays flat as the list grows into the hundreds or thousands.
+    """
+
+    def __init__(self, keywords):
+        self.keywords = frozenset(kw for kw in keywords if kw)
+        # An empty keyword matches everything, same as the plain 'in' loop
+        self.match_all = any(kw == '' for kw in keywords)
+
+        trie = _build_trie(self.keywords)
+        self.dispatch = len(trie) > DISPATCH_THRESHOLD
+        if self.dispatch:
+            self._first = re.compile('[' + ''.join(re.escape(ch) for ch in sorted(trie)) + ']').finditer
+            self._rest = {}
+            for ch, child in trie.items():
+                if len(child) == 1 and '' in child:
+                    self._rest[ch] = None # Single character keyword
+                else:
+                    self._rest[ch] = re.compile(_trie_to_regex(child)).match
+        else:
+            pattern = _trie_to_regex(trie) if trie else '(?!)' # Never matches
+            self._search = re.compile(pattern).search
+
+    def search(self, text):
+        if self.match_all:
+            return True
+        if not text:
+            return False
+        if not self.dispatch:
+            return self._search(text) is not None
+
+        rest = self._rest
+        for m in self._first(text):
+            match = rest[m.group()]
+            if match is None or match(text, m.end()):
+                return True
+        return False
+
+    def _longest_at_each_position(self, text):
+        rest = self._rest
+        for m in self._first(text):
+            ch = m.group()
+            match = rest[ch]
+            if match is None:
+                yield ch
+            else:
+                tail = match(text, m.end())
+                if tail:
+                    yield ch + tail.group()
+
+    def matches(self, text):
+        hits = set()
+        if self.match_all:
+            hits.add('')
+        if not text or not self.keywords:
+            return hits
+        if not self.dispatch:
+            hits.update(kw for kw in self.keywords if kw in text)
+            return hits
+        for found in self._longest_at_each_position(text):
+            # Only the longest keyword at each position is reported, shorter
+            # keywords that are prefixes of it (e.g. 银行 in 银行卡) hit as well
+            for end in range(1, len(found) + 1):
+                prefix = found[:end]
+                if prefix in self.keywords:
+                    hits.add(prefix)
+        return hits
+
+@lru_cache(maxsize=8)
+def _cached_matcher(keywords):
+    return KeywordMatcher(keywords)
+
+def get_matcher(keywords):
+    """Returns a compiled matcher for keywords, built once per distinct keyword list."""
+    return _cached_matcher(tuple(keywords))
@@ -0,0 +1,129 @@
+import json
+import os
+import threading
+import time
+
+from contextlib import contextmanager
+
+METRICS_DIR = "data/metrics"
+
+class RunMetrics:
+    """
+    Timing and counters for one fetch run.
+    - stage(name): context manager adding wall time to a pipeline stage.
+    - count(name, n): run-level counters (records pushed, items written ...).
+    - record_source(name, stats): per-source counters from fetch_rss_items.
+    Written as JSON lines (one file per run), a summary table and optionally a
+    Prometheus textfile. Thread safe.
+    """
+
+    def __init__(self, run_id=None):
+        self.started = time.time()
+        self.run_id = run_id or time.strftime("%Y%m%d-%H%M%S", time.localtime(self.started))
+        self.stages = {}
+        self.counters = {}
+        self.sources = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            with self._lock:
+                self.stages[name] = self.stages.get(name, 0.0) + elapsed
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def record_source(self, name, stats):
+        with self._lock:
+            self.sources[name] = dict(stats)
+
+    def totals(self):
+        with self._lock:
+            sources = list(self.sources.values())
+        totals = {"sources": len(sources)}
+        for field in ("bytes", "entries_seen", "kept", "skipped_keyword", "skipped_old", "skipped_cap"):
+            totals[field] = sum(s.get(field, 0) for s in sources)
+        totals["errors"] = sum(1 for s in sources if s.get("status") == "error")
+        totals["not_modified"] = sum(1 for s in sources if s.get("status") == "not_modified")
+        return totals
+
+    def write_jsonl(self, directory=METRICS_DIR):
+        """Writes data/metrics/run-<run_id>.jsonl: one line per source and stage, then a run line."""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"run-{self.run_id}.jsonl")
+        with self._lock:
+            sources = dict(self.sources)
+            stages = dict(self.stages)
+            counters = dict(self.counters)
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                for name, stats in sources.items():
+                    f.write(json.dumps({"type": "source", "run": self.run_id, "source": name, **stats}, ensure_ascii=False) + "\n")
+                for name, seconds in stages.items():
+                    f.write(json.dumps({"type": "stage", "run": self.run_id, "stage": name, "seconds": round(seconds, 4)}) + "\n")
+                f.write(json.dumps({
+                    "type": "run",
+                    "run": self.run_id,
+                    "started": self.started,
+                    "duration": round(time.time() - self.started, 4),
+                    "counters": counters,
+                    **self.totals()
+                }, ensure_ascii=False) + "\n")
+        except Exception as e:
+            print(f"Error writing metrics: {e}")
+        return path
+
+    def write_prometheus(self, path):
+        """node_exporter textfile collector format."""
+        lines = [
+            "# TYPE newsbot_stage_seconds gauge",
+            *(f'newsbot_stage_seconds{{stage="{name}"}} {seconds:.4f}' for name, seconds in self.stages.items()),
+            "# TYPE newsbot_run_total gauge",
+            *(f'newsbot_run_total{{counter="{name}"}} {value}' for name, value in {**self.totals(), **self.counters}.items()),
+            "# TYPE newsbot_source_latency_seconds gauge",
+        ]
+        for name, stats in self.sources.items():
+            label = name.replace('\\', '\\\\').replace('"', '\\"')
+            lines.append(f'newsbot_source_latency_seconds{{source="{label}"}} {stats.get("latency", 0):.4f}')
+        lines.append(f"newsbot_last_run_timestamp_seconds {self.started:.0f}")
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write("\n".join(lines) + "\n")
+            os.replace(tmp_path, path) # The collector must never see a half-written file
+        except Exception as e:
+            print(f"Error writing Prometheus metrics: {e}")
+
+    def summary(self, slowest=10):
+        totals = self.totals()
+        lines = ["Run metrics:"]
+        lines.append(f"   {'stage':<16}{'seconds':>10}")
+        for name, seconds in self.stages.items():
+            lines.append(f"   {name:<16}{seconds:>10.2f}")
+        lines.append(
+            f"   sources {totals['sources']} (errors {totals['errors']}, not modified {totals['not_modified']}), "
+            f"{totals['bytes'] / 1024:.1f} KB, entries {totals['entries_seen']}, kept {totals['kept']}, "
+            f"skipped {totals['skipped_keyword']} by keyword / {totals['skipped_old']} too old / {totals['skipped_cap']} over the per-source cap"
+        )
+        if self.counters:
+            lines.append("   " + ", ".join(f"{k} {v}" for k, v in self.counters.items()))
+
+        with self._lock:
+            rows = sorted(self.sources.items(), key=lambda kv: kv[1].get("latency", 0), reverse=True)[:slowest]
+        if rows:
+            lines.append(f"   {'slowest sources':<30}{'latency':>9}{'fetch':>8}{'parse':>8}{'KB':>8}{'seen':>6}{'kept':>6}")
+            for name, s in rows:
+                lines.append(
+                    f"   {name[:28]:<30}{s.get('latency', 0):>9.2f}{s.get('fetch_seconds', 0):>8.2f}"
+                    f"{s.get('parse_seconds', 0):>8.2f}{s.get('bytes', 0) / 1024:>8.1f}"
+                    f"{s.get('entries_seen', 0):>6}{s.get('kept', 0):>6}"
+                )
+        return "\n".join(lines)
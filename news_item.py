@@ -0,0 +1,58 @@
+import calendar
+import time
+
+class NewsItem:
+    """
+    One fetched news item as it moves through the pipeline (fetch -> dedup -> Feishu -> store).
+    - published: UTC epoch seconds, parsed once from the feed entry; 'date' (YYYY-MM-DD)
+      is derived from it at construction and kept for the day shards and the web page.
+    - __slots__ keeps per-item memory at a fraction of the equivalent dict.
+    """
+
+    __slots__ = ("title", "link", "source", "date", "published", "description", "keywords", "simhash", "sources", "score", "profiles")
+
+    def __init__(self, title, link, source, published, description="", keywords=(), date=None):
+        self.title = title
+        self.link = link
+        self.source = source
+        self.published = float(published)
+        self.date = date or time.strftime('%Y-%m-%d', time.gmtime(self.published))
+        self.description = description
+        self.keywords = tuple(keywords)
+        self.simhash = None # Set by dedup
+        self.sources = None # Set by dedup: every outlet that carried the story
+        self.score = 0.0 # Relevance, set at fetch (see ranker.Scorer); not stored
+        self.profiles = {} # {profile name: score} of the subscriptions it is routed to; not stored
+
+    @classmethod
+    def from_dict(cls, data):
+        """Item from a stored/exported dict (news_db.json); old exports have no 'published'."""
+        published = data.get('published')
+        if published is None:
+            published = day_timestamp(data.get('date')) or time.time()
+        item = cls(data.get('title'), data['link'], data.get('source'), published,
+                   data.get('description') or "", data.get('keywords') or (), data.get('date'))
+        item.sources = data.get('sources')
+        return item
+
+    def to_feishu_fields(self):
+        """Record fields for the bitable News table."""
+        return {
+            "Title": self.title,
+            "Link": self.link,
+            "Source": self.source,
+            "Date": int(self.published * 1000), # Feishu Date expects timestamp in ms
+            "Description": self.description
+        }
+
+    def __repr__(self):
+        return f"NewsItem({self.date} {self.source}: {self.title!r})"
+
+def day_timestamp(date):
+    """UTC midnight of a YYYY-MM-DD string as epoch seconds, or None."""
+    if not date:
+        return None
+    try:
+        return float(calendar.timegm(time.strptime(date[:10], "%Y-%m-%d")))
+    except ValueError:
+        return None
@@ -0,0 +1,77 @@
+import queue
+import threading
+import time
+
+DEFAULT_BATCH_SIZE = 50 # Items per micro-batch handed to the sinks
+DEFAULT_FLUSH_SECONDS = 2.0 # A partial batch is handed over after waiting this long
+DEFAULT_QUEUE_SIZE = 500 # Items buffered between fetchers and sinks before fetchers block
+
+_DONE = object()
+
+class Pipeline:
+    """
+    Bounded queue between the fetch workers (producers) and the sinks (one consumer).
+    - put(items): called by fetch workers as each source finishes; blocks while the
+      queue is full, so slow uploads hold back fetching instead of growing memory.
+    - run(process_batch): consumes in the calling thread, handing process_batch
+      micro-batches of batch_size items, or whatever arrived within flush_seconds.
+    - close(): producers are done; run() returns after the last batch.
+    If process_batch raises, waiting producers are released (their items dropped)
+    and the exception propagates out of run().
+    """
+
+    def __init__(self, config):
+        self.batch_size = max(1, int(config.get('pipeline_batch_size', DEFAULT_BATCH_SIZE)))
+        self.flush_seconds = float(config.get('pipeline_flush_seconds', DEFAULT_FLUSH_SECONDS))
+        self.queue = queue.Queue(maxsize=max(1, int(config.get('pipeline_queue_size', DEFAULT_QUEUE_SIZE))))
+        self.aborted = threading.Event()
+        self.batches = 0
+        self.first_batch_at = None
+
+    def _put(self, item):
+        while not self.aborted.is_set():
+            try:
+                self.queue.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def put(self, items):
+        for item in items:
+            self._put(item)
+
+    def close(self):
+        self._put(_DONE)
+
+    def _flush(self, batch, process_batch):
+        if not batch:
+            return
+        self.batches += 1
+        if self.first_batch_at is None:
+            self.first_batch_at = time.monotonic()
+        process_batch(batch)
+
+    def run(self, process_batch):
+        batch = []
+        deadline = None
+        try:
+            while True:
+                timeout = None if not batch else max(deadline - time.monotonic(), 0)
+                try:
+                    item = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    self._flush(batch, process_batch)
+                    batch = []
+                    continue
+                if item is _DONE:
+                    break
+                if not batch:
+                    deadline = time.monotonic() + self.flush_seconds
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    self._flush(batch, process_batch)
+                    batch = []
+            self._flush(batch, process_batch)
+        except BaseException:
+            self.aborted.set()
+            raise
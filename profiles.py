@@ -0,0 +1,147 @@
+import itertools
+import re
+import threading
+
+from keyword_matcher import get_matcher
+from ranker import Scorer, TopK, top_per_source, DEFAULT_MAX_PER_SOURCE, RANKING_KEYS
+from sync_index import SyncIndex, SYNC_INDEX_FILE, DEFAULT_RETENTION_DAYS
+
+DEFAULT_PROFILE = "default"
+# Settings a profile may override; everything else comes from the top level of app_config.json
+PROFILE_KEYS = ("filter_keywords", "max_lookback_hours", "match_description") + RANKING_KEYS
+
+def sync_index_path(name):
+    # The default profile keeps the original file, so existing installs need no migration
+    if name == DEFAULT_PROFILE:
+        return SYNC_INDEX_FILE
+    return SYNC_INDEX_FILE.replace(".json", "." + re.sub(r'[^\w-]', '_', name) + ".json")
+
+class Profile:
+    """
+    One subscription: its keywords, lookback window, ranking settings and the
+    Feishu table its matches are pushed to (none: store / web page only).
+    - config: app_config.json with the profile's overrides applied.
+    - sync_index: links already pushed to this profile's table (see load_sync_index).
+    """
+
+    def __init__(self, name, config, app_token=None, table_id=None):
+        self.name = name
+        self.config = config
+        self.keywords = frozenset(config.get('filter_keywords', []))
+        self.max_hours = config.get('max_lookback_hours', 24)
+        self.match_description = config.get('match_description', False)
+        self.scorer = Scorer(config)
+        self.max_items = max(1, int(config.get('max_items_per_source', DEFAULT_MAX_PER_SOURCE)))
+        self.digest_size = int(config.get('digest_size', 0) or 0)
+        self.app_token = app_token
+        self.table_id = table_id
+        self.sync_index = None
+
+    @property
+    def pushes(self):
+        return bool(self.app_token and self.table_id)
+
+    def signature(self):
+        """Settings that decide what the profile keeps (part of the HTTP cache signature)."""
+        return {"name": self.name, **{key: self.config.get(key) for key in PROFILE_KEYS}}
+
+    def load_sync_index(self, retention_days=DEFAULT_RETENTION_DAYS):
+        self.sync_index = SyncIndex(sync_index_path(self.name), retention_days)
+        self.sync_index.load()
+
+    def __repr__(self):
+        return f"Profile({self.name}: {len(self.keywords)} keywords, {self.max_hours}h, table {self.table_id or '-'})"
+
+def load_profiles(app_config, feishu_conf=None):
+    """
+    Profiles from app_config.json 'profiles':
+      [{"name": ..., "filter_keywords": [...], "max_lookback_hours": ..., "app_token": ..., "table_id": ...}, ...]
+    - Without 'profiles' there is one 'default' profile built from the top-level settings.
+    - app_token falls back to the Feishu config (same base, another table); table_id only
+      for the 'default' profile, so a new profile never pushes into the main table by accident.
+    """
+    feishu_conf = feishu_conf or {}
+    base = {key: value for key, value in app_config.items() if key != 'profiles'}
+    specs = app_config.get('profiles') or [{"name": DEFAULT_PROFILE}]
+
+    profiles = []
+    names = set()
+    for spec in specs:
+        name = spec.get('name') or DEFAULT_PROFILE
+        if name in names:
+            print(f"Warning: Duplicate profile '{name}' in app_config.json, ignoring it.")
+            continue
+        names.add(name)
+        config = dict(base)
+        config.update({key: spec[key] for key in PROFILE_KEYS if key in spec})
+        table_id = spec.get('table_id') or (feishu_conf.get('table_id') if name == DEFAULT_PROFILE else None)
+        profiles.append(Profile(name, config, spec.get('app_token') or feishu_conf.get('app_token'), table_id))
+    return profiles
+
+def keyword_matcher(profiles):
+    """One matcher over every profile's keywords; a profile's hits are the result & its keywords."""
+    return get_matcher(sorted(set().union(*(p.keywords for p in profiles))))
+
+def top_per_profile(candidates, profiles):
+    """
+    Applies every profile's max_items_per_source to one source's candidates (routed NewsItems).
+    Returns the items at least one profile kept, best first, routed only to those profiles.
+    """
+    kept = {}
+    for profile in profiles:
+        routed = [item for item in candidates if profile.name in item.profiles]
+        for item in top_per_source(routed, profile.max_items, key=lambda i, name=profile.name: i.profiles[name]):
+            kept.setdefault(id(item), (item, set()))[1].add(profile.name)
+
+    items = []
+    for item, names in kept.values():
+        item.profiles = {name: score for name, score in item.profiles.items() if name in names}
+        item.score = max(item.profiles.values())
+        items.append(item)
+    return sorted(items, key=lambda i: i.score, reverse=True)
+
+class Digests:
+    """
+    The run-wide top-k (digest_size) of every profile that has one, fed by the fetch workers.
+    - add(items): candidates go to the top-k of each digest profile they are routed to; items
+      also routed to a profile without a digest are held as they are.
+    - items(): once every source is in, the selected and held items (each once), with
+      digest profiles that did not select an item removed from its routes.
+    """
+
+    def __init__(self, profiles):
+        self.topk = {p.name: TopK(p.digest_size, key=lambda i, name=p.name: i.profiles[name])
+                     for p in profiles if p.digest_size > 0}
+        self.held = []
+        self.seen = 0
+        self._lock = threading.Lock()
+
+    def __bool__(self):
+        return bool(self.topk)
+
+    def add(self, items):
+        held = []
+        for item in items:
+            for name in item.profiles:
+                if name in self.topk:
+                    self.topk[name].add((item,))
+            if any(name not in self.topk for name in item.profiles):
+                held.append(item)
+        with self._lock:
+            self.seen += len(items)
+            self.held.extend(held)
+
+    def items(self):
+        selected = {name: topk.items() for name, topk in self.topk.items()}
+        chosen = {name: {id(i) for i in items} for name, items in selected.items()}
+        result = []
+        done = set()
+        for item in itertools.chain(*selected.values(), self.held):
+            if id(item) in done:
+                continue
+            done.add(id(item))
+            item.profiles = {name: score for name, score in item.profiles.items()
+                             if name not in chosen or id(item) in chosen[name]}
+            item.score = max(item.profiles.values())
+            result.append(item)
+        return result
@@ -0,0 +1,74 @@
+import heapq
+import itertools
+import threading
+
+from operator import attrgetter
+
+DEFAULT_MAX_PER_SOURCE = 10 # Items kept per source and run
+DEFAULT_TITLE_WEIGHT = 3.0 # Per keyword found in the title
+DEFAULT_DESCRIPTION_WEIGHT = 1.0 # Per keyword found only in the description
+DEFAULT_RECENCY_WEIGHT = 2.0 # Bonus for a brand-new item, halves every half-life
+DEFAULT_RECENCY_HALF_LIFE_HOURS = 6.0
+# app_config.json keys that change which items a run keeps
+RANKING_KEYS = ("max_items_per_source", "digest_size", "score_title_weight", "score_description_weight",
+                "score_recency_weight", "score_recency_half_life_hours", "source_priority")
+
+class Scorer:
+    """
+    Relevance of a keyword-matched entry, built from app_config.json:
+      (title_weight * title hits + description_weight * description-only hits) * source priority
+      + recency_weight * 0.5 ** (age / recency_half_life_hours)
+    - source_priority: {"source name": multiplier}, sources not listed count 1.
+    """
+
+    def __init__(self, config):
+        self.title_weight = float(config.get('score_title_weight', DEFAULT_TITLE_WEIGHT))
+        self.description_weight = float(config.get('score_description_weight', DEFAULT_DESCRIPTION_WEIGHT))
+        self.recency_weight = float(config.get('score_recency_weight', DEFAULT_RECENCY_WEIGHT))
+        self.half_life = max(float(config.get('score_recency_half_life_hours', DEFAULT_RECENCY_HALF_LIFE_HOURS)), 0.01) * 3600
+        self.source_priority = config.get('source_priority') or {}
+
+    def score(self, source, title_hits, description_hits, published, now):
+        relevance = self.title_weight * len(title_hits) + self.description_weight * len(description_hits - title_hits)
+        relevance *= float(self.source_priority.get(source, 1.0))
+        age = max(now - published, 0)
+        return relevance + self.recency_weight * 0.5 ** (age / self.half_life)
+
+_by_score = attrgetter('score')
+
+def top_per_source(items, limit, key=_by_score):
+    """The limit highest scored items of one source; on equal scores feed order wins."""
+    if len(items) <= limit:
+        return sorted(items, key=key, reverse=True)
+    return heapq.nlargest(limit, items, key=key)
+
+class TopK:
+    """
+    Global top-k over every source of a run, fed concurrently by the fetch workers.
+    - add(items): keeps the k best seen so far in a min-heap (O(log k) per item,
+      memory bounded by k however many sources there are).
+    - items(): the selection, best first; on equal scores the earlier arrival wins.
+    - key: score of an item (default its score attribute).
+    """
+
+    def __init__(self, k, key=_by_score):
+        self.k = max(1, int(k))
+        self.key = key
+        self.seen = 0
+        self._heap = []
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+
+    def add(self, items):
+        with self._lock:
+            for item in items:
+                self.seen += 1
+                entry = (self.key(item), -next(self._order), item)
+                if len(self._heap) < self.k:
+                    heapq.heappush(self._heap, entry)
+                elif entry[:2] > self._heap[0][:2]:
+                    heapq.heapreplace(self._heap, entry)
+
+    def items(self):
+        with self._lock:
+            return [entry[2] for entry in sorted(self._heap, key=lambda e: e[:2], reverse=True)]
@@ -0,0 +1,109 @@
+import json
+import os
+import threading
+import time
+
+import atomic_file
+
+JOURNAL_FILE = "data/run_journal.jsonl"
+DEFAULT_RESUME_MAX_AGE_HOURS = 6 # An unfinished run older than this is started over instead
+
+class RunJournal:
+    """
+    Checkpoint journal of the run in progress (JSON lines in JOURNAL_FILE), deleted once the
+    run completes. A run that crashes or times out leaves it behind and the next run resumes it.
+    - First line: run id and start time.
+    - Then one line per source whose items have all landed (pushed and stored), carrying what
+      snapshot(name) returns: its HTTP validators and poll state, which are otherwise only saved
+      at the end of a run. Pushed records are checkpointed per batch by the sync indexes.
+    - start(run_id): {source: line} of the sources the resumed run finished, {} for a new run.
+    - expect(name, items): a source's items enter the pipeline (none: it is done right away).
+    - landed(items, failed): a processed batch; sources with nothing pending any more are journaled,
+      except the ones in failed (records that did not reach Feishu), which the next run fetches again.
+    - complete(): the run is over, the journal is removed.
+    """
+
+    def __init__(self, snapshot, path=JOURNAL_FILE, max_age_hours=DEFAULT_RESUME_MAX_AGE_HOURS):
+        self.snapshot = snapshot
+        self.path = path
+        self.max_age = float(max_age_hours) * 3600
+        self.pending = {}
+        self.failed = set()
+        self.done = 0
+        self._file = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return None, {}
+        except OSError as e:
+            print(f"Warning: Failed to read run journal ({e}). Starting a new run.")
+            return None, {}
+
+        header = None
+        done = {}
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                break # Torn last line of the crashed run
+            if header is None:
+                header = record
+            else:
+                done[record['source']] = record
+        return header, done
+
+    def start(self, run_id):
+        header, done = self._load()
+        if header is not None and time.time() - header.get('started', 0) > self.max_age:
+            print(f"Discarding unfinished run {header.get('run')} (older than {self.max_age / 3600:g}h).")
+            header = None
+        if header is None:
+            header = {"run": run_id, "started": time.time()}
+            done = {}
+        else:
+            print(f"Resuming unfinished run {header.get('run')}: {len(done)} sources already done.")
+
+        # Rewritten clean (drops a torn line), then appended to
+        lines = [header, *done.values()]
+        atomic_file.write_bytes(self.path, "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in lines).encode('utf-8'))
+        self._file = open(self.path, 'a', encoding='utf-8')
+        return done
+
+    def _finish(self, name):
+        del self.pending[name]
+        self.done += 1
+        self._file.write(json.dumps({"source": name, **self.snapshot(name)}, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def expect(self, name, items):
+        with self._lock:
+            self.pending[name] = self.pending.get(name, 0) + len(items)
+            if not self.pending[name]:
+                self._finish(name)
+
+    def landed(self, items, failed=()):
+        with self._lock:
+            self.failed.update(failed)
+            names = set()
+            for item in items:
+                self.pending[item.source] -= 1
+                names.add(item.source)
+            for name in names:
+                if not self.pending[name] and name not in self.failed:
+                    self._finish(name)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def complete(self):
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,65 @@
+import re
+import unicodedata
+
+SEARCH_BODY_CHARS = 200 # Start of the description that is indexed, keeps the store small
+TITLE_WEIGHT = 3.0 # bm25 column weight of the title against the description
+
+# Kana, CJK ideographs and Hangul become overlapping bigrams, ASCII letters/digits whole words.
+# index.html tokenizes search input with the same rules.
+_TOKENS = re.compile(r'[\u3040-\u30ff\u3400-\u9fff\uf900-\ufaff\uac00-\ud7af]+|[a-z0-9]+')
+_CJK = re.compile(r'[\u3040-\u30ff\u3400-\u9fff\uf900-\ufaff\uac00-\ud7af]')
+
+def tokenize(text):
+    """Search tokens of text (NFKC-normalized, lowercased), in order, with repeats."""
+    if not text:
+        return []
+    tokens = []
+    for run in _TOKENS.findall(unicodedata.normalize('NFKC', text).lower()):
+        if len(run) > 1 and _CJK.match(run):
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+def document(title, description):
+    """(title, body) columns for the FTS table: space separated tokens."""
+    return (
+        " ".join(tokenize(title)),
+        " ".join(tokenize((description or "")[:SEARCH_BODY_CHARS]))
+    )
+
+def match_expression(query):
+    """
+    FTS5 MATCH expression requiring every query token, or None if the query has no tokens.
+    A single CJK character only exists inside bigrams, so it becomes a prefix query.
+    """
+    terms = []
+    for token in dict.fromkeys(tokenize(query)):
+        if len(token) == 1 and _CJK.match(token):
+            terms.append(f'"{token}"*')
+        else:
+            terms.append(f'"{token}"')
+    return " AND ".join(terms) or None
+
+def client_index(titles):
+    """
+    Compact title index for index.html: {term: delta-encoded ordinals}.
+    titles: iterable of titles in manifest order (shards newest first, items in shard order),
+    so an ordinal maps back to a shard and offset through the manifest counts.
+    """
+    postings = {}
+    count = 0
+    for ordinal, title in enumerate(titles):
+        count += 1
+        for token in set(tokenize(title)):
+            postings.setdefault(token, []).append(ordinal)
+
+    terms = {}
+    for token, ordinals in postings.items():
+        previous = 0
+        deltas = []
+        for ordinal in ordinals:
+            deltas.append(ordinal - previous)
+            previous = ordinal
+        terms[token] = deltas
+    return {"docs": count, "terms": terms}
@@ -0,0 +1,35 @@
+"""
+Searches the stored news history.
+
+Usage:
+    python search_news.py 降准 存款利率 [-n 20] [--json]
+"""
+import argparse
+import json
+import time
+
+from data_manager import search
+
+def main():
+    parser = argparse.ArgumentParser(description="Full-text search over data/news.db")
+    parser.add_argument("query", nargs="+", help="search terms, all must match")
+    parser.add_argument("-n", "--limit", type=int, default=20, help="maximum number of hits")
+    parser.add_argument("--json", action="store_true", help="print hits as JSON")
+    args = parser.parse_args()
+
+    query = " ".join(args.query)
+    started = time.perf_counter()
+    hits = search(query, args.limit)
+    elapsed = (time.perf_counter() - started) * 1000
+
+    if args.json:
+        print(json.dumps(hits, ensure_ascii=False, indent=2))
+        return
+
+    print(f"{len(hits)} hits for '{query}' ({elapsed:.1f} ms)")
+    for rank, item in enumerate(hits, 1):
+        print(f"{rank:>3}. [{item['date']}] {item['title']} ({item['source']}, score {item['score']})")
+        print(f"     {item['link']}")
+
+if __name__ == "__main__":
+    main()
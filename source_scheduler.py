@@ -0,0 +1,163 @@
+import json
+import os
+import threading
+import time
+
+import atomic_file
+
+STATE_FILE = "data/source_state.json"
+
+DEFAULT_MIN_POLL_MINUTES = 30 # Hot sources are never polled more often than this
+DEFAULT_MAX_POLL_HOURS = 24 # Healthy sources are always polled within this (capped at the lookback window)
+DEFAULT_FAILURE_BACKOFF_HOURS = 1 # Doubled for every consecutive failure...
+DEFAULT_MAX_BACKOFF_DAYS = 7 # ...up to this
+DEFAULT_SLACK_MINUTES = 30 # Runner start jitter: a source due within this is polled now
+DEFAULT_RUN_INTERVAL_HOURS = 24 # Time between runs (the workflow cron is daily), see due()
+TARGET_ITEMS_PER_POLL = 2 # Poll roughly when this many new matching items are expected
+EWMA_ALPHA = 0.3
+
+class SourceScheduler:
+    """
+    Per-source adaptive polling.
+    - State per source (data/source_state.json): last poll/success, failure streak,
+      smoothed matching items per day and latency.
+    - Busy sources are polled more often (down to min interval), quiet ones less often
+      (up to max interval), failing ones back off exponentially.
+    - A source is always polled when waiting for the next run (run_interval_hours, or the
+      daemon interval) would leave more than the lookback window since its last poll.
+    """
+
+    def __init__(self, config, path=STATE_FILE):
+        self.path = path
+        self.state = {}
+        self._lock = threading.Lock()
+
+        max_hours = min(
+            float(config.get('max_poll_hours', DEFAULT_MAX_POLL_HOURS)),
+            float(config.get('max_lookback_hours', 24)) # Polling slower than the window loses items
+        )
+        self.min_interval = float(config.get('min_poll_minutes', DEFAULT_MIN_POLL_MINUTES)) * 60
+        self.max_interval = max(max_hours * 3600, self.min_interval)
+        self.backoff_base = float(config.get('failure_backoff_hours', DEFAULT_FAILURE_BACKOFF_HOURS)) * 3600
+        self.max_backoff = float(config.get('max_backoff_days', DEFAULT_MAX_BACKOFF_DAYS)) * 86400
+        self.slack = float(config.get('schedule_slack_minutes', DEFAULT_SLACK_MINUTES)) * 60
+        self.window = float(config.get('max_lookback_hours', 24)) * 3600
+        self.run_interval = float(config.get('run_interval_hours', DEFAULT_RUN_INTERVAL_HOURS)) * 3600
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.state = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            print(f"Warning: Failed to load source state ({e}). Polling every source.")
+            self.state = {}
+
+    def save(self, rss_sources=None):
+        with self._lock:
+            state = dict(self.state)
+            if rss_sources is not None:
+                # Forget sources removed from rss_config.json
+                state = {name: s for name, s in state.items() if name in rss_sources}
+            body = json.dumps(state, ensure_ascii=False, indent=1)
+        try:
+            atomic_file.write_bytes(self.path, body.encode('utf-8'))
+        except Exception as e:
+            print(f"Error saving source state: {e}")
+
+    def entry(self, name):
+        """A source's state (None if unknown), see restore."""
+        with self._lock:
+            s = self.state.get(name)
+            return dict(s) if s else None
+
+    def restore(self, name, s):
+        """Puts back a state taken with entry(), e.g. from a resumed run's journal."""
+        with self._lock:
+            if s:
+                self.state[name] = s
+            else:
+                self.state.pop(name, None)
+
+    def interval(self, s):
+        """Seconds until a source with state s should be polled again."""
+        streak = s.get('failure_streak', 0)
+        if streak > 0:
+            return min(self.backoff_base * (2 ** (streak - 1)), self.max_backoff)
+
+        per_day = s.get('items_per_day')
+        if not per_day:
+            return self.max_interval
+        return min(max(86400 * TARGET_ITEMS_PER_POLL / per_day, self.min_interval), self.max_interval)
+
+    def health(self, s):
+        """0..1 score: success ratio, discounted by the current failure streak."""
+        polls = s.get('polls', 0)
+        if not polls:
+            return 1.0
+        ratio = s.get('successes', 0) / polls
+        return ratio / (1 + s.get('failure_streak', 0))
+
+    def due(self, rss_sources, now=None, run_interval=None):
+        """
+        Splits rss_sources into (due {name: url}, list of skipped names), keeping config order.
+        run_interval: seconds until the next run, if not run_interval_hours.
+        """
+        now = now or time.time()
+        run_interval = self.run_interval if run_interval is None else run_interval
+        due = {}
+        skipped = []
+        for name, url in rss_sources.items():
+            s = self.state.get(name)
+            if not s or s.get('url') != url or not s.get('last_polled'):
+                due[name] = url
+                continue
+            if now + self.slack >= s['last_polled'] + self.interval(s) \
+                    or now + run_interval > s['last_polled'] + self.window:
+                # Skipping it now would leave items older than the window by the next run
+                due[name] = url
+            else:
+                skipped.append(name)
+        return due, skipped
+
+    def record(self, name, url, ok, item_count, latency, now=None):
+        """Updates a source's state after a poll (thread safe)."""
+        now = now or time.time()
+        with self._lock:
+            s = self.state.get(name)
+            if not s or s.get('url') != url:
+                s = {"url": url, "polls": 0, "successes": 0, "failure_streak": 0}
+                self.state[name] = s
+
+            previous_poll = s.get('last_polled')
+            s['last_polled'] = now
+            s['polls'] = s.get('polls', 0) + 1
+
+            if ok:
+                s['successes'] = s.get('successes', 0) + 1
+                s['failure_streak'] = 0
+                s['last_success'] = now
+                # Matching items per day over the time since the previous poll
+                elapsed_days = (now - previous_poll) / 86400 if previous_poll else 1.0
+                rate = item_count / max(elapsed_days, self.min_interval / 86400)
+                old = s.get('items_per_day')
+                s['items_per_day'] = rate if old is None else EWMA_ALPHA * rate + (1 - EWMA_ALPHA) * old
+            else:
+                s['failure_streak'] = s.get('failure_streak', 0) + 1
+
+            old_latency = s.get('latency')
+            s['latency'] = latency if old_latency is None else EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * old_latency
+
+    def summary(self, limit=10):
+        """Least healthy sources first."""
+        with self._lock:
+            rows = sorted(self.state.items(), key=lambda kv: (self.health(kv[1]), -kv[1].get('failure_streak', 0)))
+        lines = ["Source health (worst first):"]
+        for name, s in rows[:limit]:
+            lines.append(
+                f"   {name}: health {self.health(s):.2f}, failures {s.get('failure_streak', 0)}, "
+                f"{s.get('items_per_day') or 0:.1f} items/day, {s.get('latency') or 0:.2f}s, "
+                f"next in {self.interval(s) / 3600:.1f}h"
+            )
+        return "\n".join(lines)
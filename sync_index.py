@@ -0,0 +1,63 @@
+import hashlib
+import json
+import os
+import time
+
+import atomic_file
+
+SYNC_INDEX_FILE = "data/synced_links.json"
+DEFAULT_RETENTION_DAYS = 30 # Must stay well above max_lookback_hours
+
+def link_key(link):
+    # 64-bit hash of the link, keeps the index small no matter how long URLs get
+    return hashlib.sha1(link.encode('utf-8')).hexdigest()[:16]
+
+class SyncIndex:
+    """
+    Persistent index of links already pushed to Feishu.
+    - Stored as {link_hash: day_number} in data/synced_links.json.
+    - Entries older than retention_days are evicted on save.
+    """
+
+    def __init__(self, path=SYNC_INDEX_FILE, retention_days=DEFAULT_RETENTION_DAYS):
+        self.path = path
+        self.retention_days = retention_days
+        self.entries = {}
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            print(f"Warning: Failed to load sync index ({e}). All records will be treated as new.")
+            self.entries = {}
+
+    def save(self):
+        self.evict()
+        try:
+            atomic_file.write_json(self.path, self.entries, separators=(',', ':'))
+        except Exception as e:
+            print(f"Error saving sync index: {e}")
+
+    def filter_new(self, records):
+        """Returns records (NewsItems) whose link has not been synced yet (also drops repeats within records)."""
+        new_records = []
+        seen = set()
+        for r in records:
+            key = link_key(r.link)
+            if key in self.entries or key in seen:
+                continue
+            seen.add(key)
+            new_records.append(r)
+        return new_records
+
+    def mark(self, records):
+        today = int(time.time() // 86400)
+        for r in records:
+            self.entries[link_key(r.link)] = today
+
+    def evict(self):
+        cutoff = int(time.time() // 86400) - self.retention_days
+        self.entries = {k: day for k, day in self.entries.items() if day >= cutoff}
@@ -0,0 +1,87 @@
+import io
+import os
+import sys
+import unittest
+
+import feedparser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from feed_stream import FeedStream
+
+RSS = """<?xml version="1.0" encoding="utf-8"?>
+<rss version="2.0" xmlns:content="http://purl.org/rss/1.0/modules/content/">
+<channel><title>RSS</title>
+<item><title>银行 存款利率下调</title><link>http://example.com/rss/1</link>
+<pubDate>Sat, 17 Oct 2026 08:30:00 +0800</pubDate><description>&lt;p&gt;正文 &amp;amp; 经济&lt;/p&gt;</description></item>
+<item><title>理财 新规</title><link>http://example.com/rss/2</link>
+<pubDate>Fri, 16 Oct 2026 22:00:00 GMT</pubDate><content:encoded><![CDATA[<p>全文</p>]]></content:encoded></item>
+</channel></rss>"""
+
+ATOM = """<?xml version="1.0" encoding="utf-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom"><title>Atom</title>
+<entry><title>基金 周报</title><link rel="alternate" href="http://example.com/atom/1"/>
+<link rel="self" href="http://example.com/atom/1.xml"/>
+<published>2026-10-17T01:02:03Z</published><updated>2026-10-17T02:00:00Z</updated><summary>摘要</summary></entry>
+<entry><title>网贷 整治</title><link href="http://example.com/atom/2"/>
+<updated>2026-10-16T10:00:00+08:00</updated><content type="html">&lt;b&gt;内容&lt;/b&gt;</content></entry>
+</feed>"""
+
+RDF = """<?xml version="1.0" encoding="utf-8"?>
+<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#" xmlns="http://purl.org/rss/1.0/"
+ xmlns:dc="http://purl.org/dc/elements/1.1/">
+<channel rdf:about="http://example.com/"><title>RDF</title></channel>
+<item rdf:about="http://example.com/rdf/1"><title>人民银行 公告</title><link>http://example.com/rdf/1</link>
+<dc:date>2026-10-17T09:00:00+08:00</dc:date><description>公开市场操作</description></item>
+</rdf:RDF>"""
+
+GBK = """<?xml version="1.0" encoding="gbk"?>
+<rss version="2.0"><channel><title>GBK</title>
+<item><title>金融监管 总局发布通知</title><link>http://example.com/gbk/1</link>
+<pubDate>Sat, 17 Oct 2026 08:00:00 +0800</pubDate><description>客户经理</description></item>
+</channel></rss>""".encode('gbk')
+
+class _Response:
+    """Just enough of a streamed requests response for FeedStream."""
+
+    def __init__(self, body):
+        self.raw = io.BytesIO(body)
+
+    def close(self):
+        pass
+
+def _fields(entry):
+    # What fetch_rss_items reads from an entry
+    published = entry.get('published_parsed') or entry.get('updated_parsed')
+    return (entry.get('title'), entry.get('link'), tuple(published[:6]) if published else None)
+
+class FeedStreamMatchesFeedparser(unittest.TestCase):
+
+    def assertSameEntries(self, body):
+        stream = FeedStream(_Response(body))
+        streamed = [_fields(e) for e in stream.entries()]
+        parsed = [_fields(e) for e in feedparser.parse(body).entries]
+        self.assertTrue(parsed)
+        self.assertEqual(streamed, parsed)
+        return stream
+
+    def test_rss(self):
+        self.assertFalse(self.assertSameEntries(RSS.encode('utf-8')).bozo)
+
+    def test_atom(self):
+        self.assertFalse(self.assertSameEntries(ATOM.encode('utf-8')).bozo)
+
+    def test_rdf(self):
+        self.assertFalse(self.assertSameEntries(RDF.encode('utf-8')).bozo)
+
+    def test_gbk_falls_back_to_feedparser(self):
+        # expat rejects multi-byte encodings with a ValueError, not a ParseError
+        self.assertTrue(self.assertSameEntries(GBK).bozo)
+
+    def test_descriptions(self):
+        entries = list(FeedStream(_Response(RSS.encode('utf-8'))).entries())
+        self.assertIn('正文', entries[0].summary)
+        self.assertIn('全文', entries[1].summary)
+
+if __name__ == "__main__":
+    unittest.main()
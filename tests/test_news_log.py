@@ -0,0 +1,66 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import data_manager
+from news_item import NewsItem
+
+ITEM_QUERY = "SELECT title, link, source, date, published, description, sources, simhash FROM news ORDER BY link"
+
+def _item(n, source="src"):
+    return NewsItem(f"银行 新闻 {n}", f"http://example.com/{n}", source, time.time() - n * 60, f"正文 {n}")
+
+class NewsLogRebuild(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.mkdtemp()
+        os.chdir(self.tmp)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmp)
+
+    def rows(self):
+        conn = data_manager.get_connection()
+        try:
+            return [tuple(r) for r in conn.execute(ITEM_QUERY)]
+        finally:
+            conn.close()
+
+    def test_store_is_rebuilt_from_log(self):
+        data_manager.insert_items([_item(n) for n in range(5)])
+        data_manager.insert_items([_item(2), _item(5)]) # One already stored
+        data_manager.merge_sources({"http://example.com/1": ["other"]})
+        before = self.rows()
+
+        os.remove(data_manager.STORE_FILE)
+        self.assertEqual(self.rows(), before)
+        self.assertEqual(len(before), 6)
+        with open(data_manager.LOG_FILE, 'r', encoding='utf-8') as f:
+            self.assertEqual(len(f.readlines()), 7) # 6 items + 1 merge
+
+    def test_torn_last_line_is_skipped(self):
+        data_manager.insert_items([_item(0)])
+        with open(data_manager.LOG_FILE, 'ab') as f:
+            f.write(b'{"title": "torn')
+        data_manager.insert_items([_item(1)])
+
+        os.remove(data_manager.STORE_FILE)
+        self.assertEqual([r[1] for r in self.rows()], ["http://example.com/0", "http://example.com/1"])
+
+    def test_existing_store_seeds_log(self):
+        data_manager.insert_items([_item(n) for n in range(3)])
+        os.remove(data_manager.LOG_FILE)
+        before = self.rows() # Reopening writes the stored items to a new log
+
+        os.remove(data_manager.STORE_FILE)
+        self.assertEqual(self.rows(), before)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,169 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import data_manager
+import fetch_news
+from news_item import NewsItem
+from run_journal import RunJournal
+
+SOURCES = {f"src{n}": f"http://example.com/feed{n}" for n in range(3)}
+ITEMS_PER_SOURCE = 3
+APP_CONFIG = {
+    "filter_keywords": ["银行"],
+    "fetch_concurrency": 1, # One source at a time, so every micro-batch is one source
+    "pipeline_batch_size": ITEMS_PER_SOURCE,
+    "near_duplicate_detection": False,
+    "adaptive_polling": False
+}
+
+def _items(name, n=ITEMS_PER_SOURCE, days_ago=0):
+    published = time.time() - days_ago * 86400
+    return [NewsItem(f"{name} 银行 {i}", f"http://example.com/{name}/{i}", name, published - i) for i in range(n)]
+
+class RunJournalBookkeeping(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "journal.jsonl")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def journal(self):
+        return RunJournal(lambda name: {"url": SOURCES[name]}, self.path)
+
+    def test_source_is_done_once_all_items_landed(self):
+        journal = self.journal()
+        self.assertEqual(journal.start("run-1"), {})
+        a, b = _items("src0"), _items("src1")
+        journal.expect("src0", a)
+        journal.expect("src1", b)
+        journal.expect("src2", []) # Nothing matched: done right away
+        journal.landed(a[:2] + b)
+        journal.landed(a[2:])
+        journal.close()
+
+        done = self.journal().start("run-2")
+        self.assertEqual(set(done), {"src0", "src1", "src2"})
+        self.assertEqual(done["src0"]["url"], SOURCES["src0"])
+
+    def test_failed_source_is_not_done(self):
+        journal = self.journal()
+        journal.start("run-1")
+        a, b = _items("src0"), _items("src1")
+        journal.expect("src0", a)
+        journal.expect("src1", b)
+        journal.landed(a[:1], failed={"src0"}) # Push failed for part of src0
+        journal.landed(a[1:] + b)
+        journal.close()
+
+        self.assertEqual(set(self.journal().start("run-2")), {"src1"})
+
+    def test_torn_line_and_stale_run(self):
+        journal = self.journal()
+        journal.start("run-1")
+        journal.expect("src0", [])
+        journal.close()
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write('{"source": "sr')
+        self.assertEqual(set(self.journal().start("run-2")), {"src0"})
+
+        with mock.patch("time.time", return_value=time.time() + 7 * 3600):
+            self.assertEqual(self.journal().start("run-3"), {})
+
+    def test_complete_removes_journal(self):
+        journal = self.journal()
+        journal.start("run-1")
+        journal.complete()
+        self.assertFalse(os.path.exists(self.path))
+
+class ResumeKilledRun(unittest.TestCase):
+    """A run killed between two batches (before it exported) is resumed by the next one."""
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.mkdtemp()
+        os.chdir(self.tmp)
+        with open("rss_config.json", 'w', encoding='utf-8') as f:
+            json.dump(SOURCES, f)
+        with open("app_config.json", 'w', encoding='utf-8') as f:
+            json.dump(APP_CONFIG, f)
+        env = {k: v for k, v in os.environ.items() if not k.startswith("FEISHU_")}
+        patcher = mock.patch.dict(os.environ, env, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.fetched = []
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmp)
+
+    def fake_fetch(self, url, name, config, failed_log=None, http_cache=None, *args, **kwargs):
+        self.fetched.append(name)
+        http_cache.restore(url, {"etag": f'"{name}"', "last_modified": None, "size": 1})
+        items = _items(name, days_ago=1 if name == "src0" else 0)
+        for item in items:
+            item.profiles = {"default": 1.0}
+        return items
+
+    def run_cycle(self):
+        with mock.patch.object(fetch_news, "fetch_rss_items", self.fake_fetch):
+            fetch_news.run_cycle(fetch_news.FetchState())
+
+    def test_resume(self):
+        # An earlier run's export, so the resumed run updates the manifest instead of rebuilding it
+        data_manager.save_data(_items("old", n=1, days_ago=3))
+
+        # Run 1: the first batch (src0) lands, the process dies on the second before exporting
+        inserted = []
+        def insert_then_die(items):
+            if inserted:
+                raise KeyboardInterrupt("killed")
+            inserted.append(items)
+            return data_manager.insert_items(items)
+        with mock.patch.object(fetch_news, "insert_items", insert_then_die), \
+                mock.patch.object(fetch_news, "export_views"):
+            with self.assertRaises(KeyboardInterrupt):
+                self.run_cycle()
+        self.assertFalse(os.path.exists("data/http_cache.json"))
+
+        # Run 2: only the unfinished sources are fetched
+        self.fetched = []
+        self.run_cycle()
+        self.assertEqual(sorted(self.fetched), ["src1", "src2"])
+        self.assertFalse(os.path.exists("data/run_journal.jsonl"))
+
+        # src0's validators come back from the journal
+        with open("data/http_cache.json", 'r', encoding='utf-8') as f:
+            entries = json.load(f)["entries"]
+        self.assertEqual({url: e["etag"] for url, e in entries.items()},
+                         {url: f'"{name}"' for name, url in SOURCES.items()})
+
+        # The day only the killed run inserted is exported too
+        with open(data_manager.MANIFEST_FILE, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        total = len(SOURCES) * ITEMS_PER_SOURCE + 1
+        self.assertEqual(manifest["total"], total)
+        self.assertEqual(manifest["search"]["docs"], total)
+        self.assertEqual(len(manifest["shards"]), 3)
+
+    def test_stale_days_are_reexported(self):
+        data_manager.save_data(_items("src0"))
+        data_manager.insert_items(_items("src1", days_ago=1)) # Never exported
+        data_manager.export_views(set(), 0)
+        with open(data_manager.MANIFEST_FILE, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        self.assertEqual(sorted(s["count"] for s in manifest["shards"]), [3, 3])
+        self.assertEqual(manifest["search"]["docs"], 6)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+import json
+import os
+import threading
+import time
+
+import http_client
+
+# Overridable so benchmarks and local runs can point at a stand-in server
+FEISHU_BASE_URL = os.environ.get("FEISHU_BASE_URL", "https://open.feishu.cn").rstrip('/')
+
+TOKEN_FILE = "token.json"
+# Feishu hands out a new tenant token once the current one has less than 30 minutes left,
+# so refreshing inside that window always yields a fresh 2h token
+REFRESH_BEFORE_SECONDS = 30 * 60
+EXPIRY_MARGIN_SECONDS = 60 # Stored expire_time is this much earlier than Feishu's
+TOKEN_INVALID_CODES = {99991663, 99991668} # "tenant access token invalid / expired"
+
+class TokenManager:
+    """
+    In-process tenant_access_token holder shared by every Feishu caller.
+    - Token kept in memory, persisted to TOKEN_FILE (atomic replace) so the next
+      process can reuse it.
+    - Single-flight: concurrent callers needing a token trigger one auth request.
+    - Proactive: inside the refresh window one caller refreshes while the others
+      keep using the still-valid token.
+    """
+
+    def __init__(self, app_id, app_secret, path=TOKEN_FILE):
+        self.app_id = app_id
+        self.app_secret = app_secret
+        self.path = path
+        self.token = None
+        self.expire_time = 0.0
+        self.refreshes = 0
+        self._lock = threading.Lock() # Guards token / expire_time
+        self._refresh_lock = threading.Lock() # Held by the one thread talking to the auth API
+        self._loaded = False
+
+    def get(self, force=False):
+        """Returns a valid token, or None if authentication failed."""
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            token, remaining = self.token, self.expire_time - time.time()
+
+        if not force and token and remaining > REFRESH_BEFORE_SECONDS:
+            return token
+
+        usable = not force and token and remaining > 0
+        if usable:
+            # Proactive refresh: whoever gets the lock refreshes, everyone else carries on
+            if not self._refresh_lock.acquire(blocking=False):
+                return token
+        else:
+            self._refresh_lock.acquire()
+        try:
+            with self._lock:
+                # Another thread may have refreshed while we waited
+                if self.token and self.token != token and self.expire_time - time.time() > REFRESH_BEFORE_SECONDS:
+                    return self.token
+            fresh = self._refresh()
+            return fresh or (token if usable else None)
+        finally:
+            self._refresh_lock.release()
+
+    def invalidate(self, token):
+        """Drops token after the API rejected it; the next get() fetches a new one."""
+        with self._lock:
+            if self.token == token:
+                self.token = None
+                self.expire_time = 0.0
+
+    def _load(self):
+        self._loaded = True
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            print(f"Warning: Failed to load cached token ({e}).")
+            return
+        if data.get('app_id', self.app_id) != self.app_id:
+            return # Cached for another app
+        self.token = data.get('tenant_access_token')
+        self.expire_time = float(data.get('expire_time', 0))
+
+    def _save(self):
+        tmp_path = self.path + ".tmp"
+        try:
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({
+                    "app_id": self.app_id,
+                    "tenant_access_token": self.token,
+                    "expire_time": self.expire_time
+                }, f)
+            os.replace(tmp_path, self.path) # Readers never see a half-written file
+        except OSError as e:
+            print(f"Warning: Failed to cache token ({e}).")
+
+    def _refresh(self):
+        url = f"{FEISHU_BASE_URL}/open-apis/auth/v3/tenant_access_token/internal"
+        headers = {"Content-Type": "application/json; charset=utf-8"}
+        data = {"app_id": self.app_id, "app_secret": self.app_secret}
+
+        try:
+            response = http_client.get_session().post(url, headers=headers, json=data, timeout=10)
+            response.raise_for_status()
+            res_json = response.json()
+        except Exception as e:
+            print(f"Feishu Auth Exception: {e}")
+            return None
+        if res_json.get("code") != 0:
+            print(f"Feishu Auth Error: {res_json}")
+            return None
+
+        with self._lock:
+            self.token = res_json.get("tenant_access_token")
+            self.expire_time = time.time() + res_json.get("expire", 7200) - EXPIRY_MARGIN_SECONDS
+            self.refreshes += 1
+            self._save()
+            return self.token
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+def get_manager(app_id, app_secret):
+    """The shared TokenManager for an app (one per process)."""
+    with _managers_lock:
+        manager = _managers.get(app_id)
+        if manager is None or manager.app_secret != app_secret:
+            manager = TokenManager(app_id, app_secret)
+            _managers[app_id] = manager
+        return manager
+
+def current_token(token):
+    """token: a token string or a TokenManager. Returns the token string to send."""
+    return token.get() if isinstance(token, TokenManager) else token
@@ -1,6 +1,8 @@
-import requests
 import json
 
+import http_client
+from token_manager import FEISHU_BASE_URL, get_manager
+
 def load_config():
     try:
         with open('feishu_config.json', 'r', encoding='utf-8') as f:
@@ -12,26 +14,21 @@ def check_auth():
     config = load_config()
     print("--- 1. Getting Tenant Access Token ---")
     
-    url = "https://open.feishu.cn/open-apis/auth/v3/tenant_access_token/internal"
-    data = {"app_id": config['app_id'], "app_secret": config['app_secret']}
-    
-    resp = requests.post(url, json=data)
-    print(f"Token Status: {resp.status_code}")
-    
-    if resp.status_code != 200:
-        print("Failed to get token:", resp.text)
+    # force: this script exists to check that the credentials work, not the cache
+    token = get_manager(config['app_id'], config['app_secret']).get(force=True)
+    if not token:
+        print("Failed to get token.")
         return
 
-    token = resp.json().get("tenant_access_token")
     print(f"Token: {token[:10]}... (Length: {len(token)})")
 
     print("\n--- 2. Checking Base Info (App Token) ---")
     # API: Get Base Info
     # GET https://open.feishu.cn/open-apis/bitable/v1/apps/:app_token
-    base_url = f"https://open.feishu.cn/open-apis/bitable/v1/apps/{config['app_token']}"
+    base_url = f"{FEISHU_BASE_URL}/open-apis/bitable/v1/apps/{config['app_token']}"
     headers = {"Authorization": f"Bearer {token}"}
     
-    resp = requests.get(base_url, headers=headers)
+    resp = http_client.get_session().get(base_url, headers=headers, timeout=10)
     print(f"Base Info Status: {resp.status_code}")
     print(f"Response: {resp.text}")
 
@@ -1,13 +1,24 @@
 import xml.etree.ElementTree as ET
-import requests
 import feedparser
+import http_client
+import atomic_file
+import argparse
 import concurrent.futures
 import json
+import os
 import time
 
 OPML_FILE = "feeds-zh.opml"
 OUTPUT_FILE = "rss_config.json"
+CACHE_FILE = "data/verify_cache.json" # Last verification result per feed URL
 MAX_WORKERS = 20  # Parallel checks
+MAX_AGE_HOURS = 24 * 7 # Working feeds are re-verified after this
+DROP_AFTER_FAILURES = 3 # Consecutive failed checks before a feed is removed from OUTPUT_FILE
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'application/rss+xml, application/xml, text/xml, */*'
+}
 
 def parse_opml(file_path):
     feeds = []
@@ -23,71 +34,183 @@ def parse_opml(file_path):
         print(f"Error parsing OPML: {e}")
     return feeds
 
-def verify_feed(feed):
+def load_cache():
+    if not os.path.exists(CACHE_FILE):
+        return {}
+    try:
+        with open(CACHE_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (json.JSONDecodeError, OSError) as e:
+        print(f"Warning: Failed to load verification cache ({e}). Verifying everything.")
+        return {}
+
+def save_cache(cache):
+    atomic_file.write_json(CACHE_FILE, cache, indent=1)
+
+def needs_check(entry, now, max_age):
+    """Unknown, failing and stale feeds are checked; recently verified ones are skipped."""
+    if not entry or entry.get('status') != 'ok':
+        return True
+    return now - entry.get('checked', 0) >= max_age
+
+def verify_feed(feed, entry=None):
+    """
+    Checks one feed, returns its new cache entry.
+    - A feed verified before is fetched conditionally (ETag / Last-Modified):
+      304 means it is still the feed we verified, nothing is downloaded or parsed.
+    """
     url = feed['url']
     title = feed['title']
-    
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-        'Accept': 'application/rss+xml, application/xml, text/xml, */*'
+    entry = entry or {}
+
+    headers = dict(HEADERS)
+    if entry.get('status') == 'ok':
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+    result = {
+        "name": entry.get('name') or title,
+        "title": title,
+        "checked": time.time(),
+        "failures": entry.get('failures', 0)
     }
-    
+    started = time.monotonic()
     try:
         # 1. Network Check
-        resp = requests.get(url, headers=headers, timeout=10)
+        resp = http_client.get_session().get(url, headers=headers, timeout=10)
+        result['latency'] = round(time.monotonic() - started, 3)
+        if resp.status_code == 304:
+            result.update({
+                "status": "ok",
+                "not_modified": True,
+                "etag": entry.get('etag'),
+                "last_modified": entry.get('last_modified'),
+                "entries": entry.get('entries', 0),
+                "failures": 0
+            })
+            return result
         if resp.status_code != 200:
-            return None # Fail
-            
+            raise ValueError(f"HTTP {resp.status_code}")
+
         # 2. Content Check
         # Some feeds might return 200 but be empty or html error pages
         d = feedparser.parse(resp.content)
-        if d.bozo == 0 or len(d.entries) > 0 or d.feed.get('title'):
-             # Determine a robust name
-             final_name = d.feed.get('title', title)
-             return {"name": final_name, "url": url}
-        else:
-            return None
-            
-    except Exception:
-        return None
+        if not (d.bozo == 0 or len(d.entries) > 0 or d.feed.get('title')):
+            raise ValueError("Not a feed")
+
+        # Determine a robust name
+        result.update({
+            "status": "ok",
+            "name": d.feed.get('title', title),
+            "etag": resp.headers.get('ETag'),
+            "last_modified": resp.headers.get('Last-Modified'),
+            "entries": len(d.entries),
+            "failures": 0
+        })
+    except Exception as e:
+        result.setdefault('latency', round(time.monotonic() - started, 3))
+        result.update({
+            "status": "failed",
+            "error": str(e)[:200],
+            "failures": result['failures'] + 1
+        })
+    return result
+
+def merge_config(feeds, cache):
+    """
+    Merges verification results into OUTPUT_FILE instead of rewriting it:
+    - working feeds that are missing are added (names made unique),
+    - feeds failing DROP_AFTER_FAILURES checks in a row are removed (and listed),
+    - everything else, including hand-added sources and renamed entries, is kept.
+    """
+    try:
+        with open(OUTPUT_FILE, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except (json.JSONDecodeError, FileNotFoundError):
+        config = {}
+
+    names_by_url = {url: name for name, url in config.items()}
+    added = []
+    dropped = []
+    for feed in feeds:
+        url = feed['url']
+        entry = cache.get(url, {})
+        if entry.get('status') == 'ok' and url not in names_by_url:
+            name = entry.get('name') or feed['title'] or url
+            base, n = name, 2
+            while name in config:
+                name = f"{base} ({n})"
+                n += 1
+            config[name] = url
+            names_by_url[url] = name
+            added.append(name)
+        elif entry.get('status') == 'failed' and url in names_by_url \
+                and entry.get('failures', 0) >= DROP_AFTER_FAILURES:
+            name = names_by_url.pop(url)
+            config.pop(name, None)
+            dropped.append((name, entry.get('error')))
+
+    atomic_file.write_json(OUTPUT_FILE, config, indent=4)
+    return config, added, dropped
 
 def main():
+    parser = argparse.ArgumentParser(description=f"Verifies the feeds in {OPML_FILE} and merges them into {OUTPUT_FILE}")
+    parser.add_argument("--full", action="store_true", help="re-verify every feed, ignoring the cache")
+    parser.add_argument("--max-age", type=float, default=MAX_AGE_HOURS, help="hours before a working feed is re-verified")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="parallel checks")
+    args = parser.parse_args()
+
     print(f"Parsing {OPML_FILE}...")
     feeds = parse_opml(OPML_FILE)
-    print(f"Found {len(feeds)} feeds. Verifying availability (this may take a minute)...")
-    
-    valid_feeds = {}
-    
+    cache = {} if args.full else load_cache()
+
+    now = time.time()
+    pending = [f for f in feeds if needs_check(cache.get(f['url']), now, args.max_age * 3600)]
+    print(f"Found {len(feeds)} feeds. Verifying {len(pending)} ({len(feeds) - len(pending)} verified within {args.max_age:g}h)...")
+
     start_time = time.time()
     completed = 0
-    total = len(feeds)
-    
-    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        future_to_feed = {executor.submit(verify_feed, feed): feed for feed in feeds}
-        
+    total = len(pending)
+    not_modified = 0
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        future_to_feed = {executor.submit(verify_feed, feed, cache.get(feed['url'])): feed for feed in pending}
+
         for future in concurrent.futures.as_completed(future_to_feed):
             completed += 1
+            feed = future_to_feed[future]
             result = future.result()
-            if result:
-                valid_feeds[result['name']] = result['url']
-                print(f"[✅] {result['name']}")
+            cache[feed['url']] = result
+            if result['status'] == 'ok':
+                if result.get('not_modified'):
+                    not_modified += 1
+                else:
+                    print(f"[✅] {result['name']}")
             else:
-                pass
-                # print(f"[❌] {future_to_feed[future]['title']}")
-                
+                print(f"[❌] {feed['title']}: {result['error']} ({result['failures']}x)")
+
             # Simple progress
             if completed % 10 == 0:
                 print(f"Progress: {completed}/{total}")
 
+    # Forget feeds no longer in the OPML
+    urls = {f['url'] for f in feeds}
+    cache = {url: entry for url, entry in cache.items() if url in urls}
+    save_cache(cache)
+
     duration = time.time() - start_time
-    print(f"\nVerification finished in {duration:.2f}s.")
-    print(f"Valid Feeds: {len(valid_feeds)} / {total}")
-    
+    valid = sum(1 for f in feeds if cache.get(f['url'], {}).get('status') == 'ok')
+    print(f"\nVerification finished in {duration:.2f}s ({not_modified} not modified).")
+    print(f"Valid Feeds: {valid} / {len(feeds)}")
+
     # Save to config
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(valid_feeds, f, indent=4, ensure_ascii=False)
-    
-    print(f"Updated {OUTPUT_FILE}")
+    config, added, dropped = merge_config(feeds, cache)
+    print(f"Updated {OUTPUT_FILE}: {len(config)} sources, {len(added)} added, {len(dropped)} removed.")
+    for name, error in dropped:
+        print(f"   Removed '{name}' after {DROP_AFTER_FAILURES} failed checks: {error}")
+    print(http_client.connection_summary())
 
 if __name__ == "__main__":
     main()